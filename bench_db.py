@@ -0,0 +1,98 @@
+# bench_db.py
+"""
+Смешанная нагрузка чтение/запись на db_dao для сравнения профилей хранилища.
+
+    python bench_db.py                 # legacy против wal
+    python bench_db.py wal wal_durable --seconds 10 --readers 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import db_dao as dao
+
+
+def _reader(stop: threading.Event, users: int, lat: list) -> None:
+    rnd = random.Random()
+    while not stop.is_set():
+        uid = rnd.randrange(users)
+        t0 = time.perf_counter()
+        dao.get_lang(uid)
+        dao.get_question_by_index(rnd.randrange(10), lang="en")
+        dao.prof_by_cat(rnd.choice(dao.CATEGORIES))
+        lat.append(time.perf_counter() - t0)
+
+
+def _writer(stop: threading.Event, users: int, lat: list) -> None:
+    rnd = random.Random()
+    while not stop.is_set():
+        uid = rnd.randrange(users)
+        t0 = time.perf_counter()
+        if rnd.random() < 0.5:
+            dao.set_interest(uid, rnd.choice(dao.CATEGORIES))
+        else:
+            dao.save_test_result(uid, {"tech": 3})
+        lat.append(time.perf_counter() - t0)
+
+
+def _p(vals: list, q: float) -> float:
+    if not vals:
+        return 0.0
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(q * len(vals)))] * 1000
+
+
+def run(profile: str, seconds: float, readers: int, writers: int, users: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        dao.close_pool()
+        dao.DB_PATH = os.path.join(tmp, "bench.db")
+        dao.CONTENT_DB_PATH = ""
+        dao.DB_PROFILE = profile
+        dao.init_db()
+        dao.seed_data()
+        for uid in range(users):
+            dao.add_user(uid, f"user{uid}")
+
+        stop = threading.Event()
+        r_lat: list = []
+        w_lat: list = []
+        threads = [
+            threading.Thread(target=_reader, args=(stop, users, r_lat))
+            for _ in range(readers)
+        ] + [
+            threading.Thread(target=_writer, args=(stop, users, w_lat))
+            for _ in range(writers)
+        ]
+        for th in threads:
+            th.start()
+        time.sleep(seconds)
+        stop.set()
+        for th in threads:
+            th.join()
+        dao.close_pool()
+
+    print(
+        f"{profile:12} reads {len(r_lat) / seconds:8.0f}/s "
+        f"(p50 {_p(r_lat, 0.5):6.2f} ms, p99 {_p(r_lat, 0.99):7.2f} ms)  "
+        f"writes {len(w_lat) / seconds:7.0f}/s "
+        f"(p50 {_p(w_lat, 0.5):6.2f} ms, p99 {_p(w_lat, 0.99):7.2f} ms)"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("profiles", nargs="*", default=["legacy", "wal"])
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--writers", type=int, default=1)
+    ap.add_argument("--users", type=int, default=1000)
+    args = ap.parse_args()
+    for profile in args.profiles:
+        run(profile, args.seconds, args.readers, args.writers, args.users)
+
+
+if __name__ == "__main__":
+    main()
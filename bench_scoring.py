@@ -0,0 +1,108 @@
+# bench_scoring.py
+"""
+Подсчёт баллов теста: цикл по словарям весов против матрицы scoring.py.
+
+Случайные прохождения теста по каталогу из сида; все способы обязаны
+дать одинаковые баллы (иначе код выхода 1).
+
+    python bench_scoring.py [--sessions 100000] [--early 5000]
+
+--early: на первых N прохождениях — сколько вопросов в среднем задаёт
+ранний финиш (top1 / top2) и совпадает ли его итог с полным прохождением.
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+
+import db_dao as dao
+import scoring
+
+
+def _loop(snap: dao.ContentSnapshot, sessions) -> list:
+    # как раньше в answer_callback: словарь весов на каждый ответ
+    out = []
+    for answers in sessions:
+        scores = dict.fromkeys(dao.CATEGORIES, 0)
+        for aid in answers:
+            for cat, w in snap.weights(aid).items():
+                scores[cat] += w or 0
+        out.append([scores[c] for c in dao.CATEGORIES])
+    return out
+
+
+def _early_finish(eng: scoring.ScoringEngine, sessions, mode: str) -> list:
+    """Для каждого прохождения: (вопросов задано, итог совпал с полным)."""
+    out = []
+    keep = 1 if mode == "top1" else 2
+    for answers in sessions:
+        prefix = np.cumsum(eng.matrix[eng.rows(answers)], axis=0)
+        asked = next(
+            (k for k in range(1, len(answers)) if eng.decided(prefix[k - 1], k, mode)),
+            len(answers),
+        )
+        early = dao.top_two(tuple(prefix[asked - 1].tolist()))[:keep]
+        full = dao.top_two(tuple(prefix[-1].tolist()))[:keep]
+        out.append((asked, early == full))
+    return out
+
+
+def _timed(label: str, n: Optional[int], fn):
+    t0 = time.perf_counter()
+    res = fn()
+    dt = time.perf_counter() - t0
+    rate = f"  {n / dt:12,.0f} sessions/s" if n else ""
+    print(f"{label:14} {dt * 1000:9.1f} ms{rate}")
+    return res
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Бенчмарк подсчёта баллов теста")
+    ap.add_argument("--sessions", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--early", type=int, default=5000)
+    args = ap.parse_args()
+
+    snap = dao.seed_snapshot()
+    rnd = random.Random(args.seed)
+    choices = [
+        [a[0] for a in snap.answers_by_question[row[0]]]
+        for _, row in sorted(snap.questions_by_idx.items())
+        if snap.answers_by_question.get(row[0])
+    ]
+    sessions = [[rnd.choice(c) for c in choices] for _ in range(args.sessions)]
+    blobs = [dao.pack_ints(s) for s in sessions]
+    n = len(sessions)
+    print(f"{n} sessions x {len(choices)} answers")
+
+    eng = _timed("compile", None, lambda: scoring.ScoringEngine.from_snapshot(snap))
+    expected = _timed("dict loop", n, lambda: _loop(snap, sessions))
+    single = _timed("score()", n, lambda: [eng.score(s).tolist() for s in sessions])
+    batch = _timed("score_batch", n, lambda: eng.score_batch(sessions).tolist())
+    packed = _timed("score_packed", n, lambda: eng.score_packed(blobs).tolist())
+
+    bad = [name for name, res in (("score", single), ("score_batch", batch),
+                                  ("score_packed", packed)) if res != expected]
+    if bad:
+        print("mismatch: " + ", ".join(bad), file=sys.stderr)
+        return 1
+
+    sample = sessions[: args.early]
+    for mode in scoring.EARLY_FINISH_MODES[1:]:
+        if not sample:
+            break
+        res = _early_finish(eng, sample, mode)
+        asked = sum(a for a, _ in res) / len(res)
+        print(f"early {mode}: {asked:.2f}/{len(choices)} questions on average, "
+              f"{sum(a < len(choices) for a, _ in res) / len(res):.0%} finished early")
+        if not all(same for _, same in res):
+            print(f"early {mode}: result differs from the full test", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# bench_sessions.py
+"""
+Память под живые сессии теста: словари баллов против TestSession.
+
+    python bench_sessions.py [--sessions 100000] [--answers 10]
+
+legacy      — как было: user_scores[uid] = {"creative": 0, ...}, user_qidx[uid]
+TestSession — слоты + один массив int32 (счётчики, время, баллы, id ответов)
+SessionStore — in-memory слой сессий с MemoryStorage под ним (плюс упакованные строки);
+  строкой ниже — сколько из этого занимают строки хранилища (в SQLite их нет в памяти)
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+import db_dao as dao
+from sessions import MODE_TEST, SessionStore, TestSession
+from storage import MemoryStorage
+
+
+def _measure(label: str, n: int, build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{label:14} {used / 2**20:8.1f} MiB  {used / max(n, 1):7.0f} B/session")
+    del keep
+    return used
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Память под сессии теста")
+    ap.add_argument("--sessions", type=int, default=100_000)
+    ap.add_argument("--answers", type=int, default=10)
+    args = ap.parse_args()
+
+    st = MemoryStorage()
+    snap = st.content()
+    rows = list(snap.answer_weights.items())
+    rnd = random.Random(1)
+    paths = [
+        [rows[rnd.randrange(len(rows))] for _ in range(args.answers)]
+        for _ in range(args.sessions)
+    ]
+    n = len(paths)
+    print(f"{n} sessions x {args.answers} answers")
+
+    now = int(time.time())
+
+    def legacy():
+        user_scores, user_qidx = {}, {}
+        for uid, path in enumerate(paths):
+            scores = {"creative": 0, "tech": 0, "social": 0, "business": 0, "green": 0}
+            for _, weights in path:
+                for cat, w in zip(dao.CATEGORIES, weights):
+                    scores[cat] += w
+            user_scores[uid] = scores
+            user_qidx[uid] = len(path)
+        return user_scores, user_qidx
+
+    def slotted():
+        live = {}
+        for uid, path in enumerate(paths):
+            s = TestSession(uid, MODE_TEST, started_at=now, updated_at=now)
+            for aid, weights in path:
+                s.add_answer(aid, weights)
+            live[uid] = s
+        return live
+
+    def store():
+        ss = SessionStore(MemoryStorage(), max_sessions=n + 1, max_bytes=sys.maxsize)
+        for uid, path in enumerate(paths):
+            ss.start(uid, MODE_TEST)
+            for aid, weights in path:
+                ss.record_answer(uid, aid, weights)
+        return ss
+
+    def rows():
+        st = MemoryStorage()
+        for s in slotted().values():
+            st.save_session(s.to_row())
+        return st
+
+    _measure("legacy", n, legacy)
+    _measure("TestSession", n, slotted)
+    total = _measure("SessionStore", n, store)
+    backing = _measure("  rows", n, rows)
+    tier = total - backing
+    print(f"{'  tier':14} {tier / 2**20:8.1f} MiB  {tier / max(n, 1):7.0f} B/session")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# bench_storage.py
+"""
+Одна и та же смешанная нагрузка хендлеров на разных хранилищах storage.py.
+
+    python bench_storage.py                       # sqlite против memory
+    python bench_storage.py memory --seconds 10 --threads 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import db_dao as dao
+from storage import STORAGES, Storage
+
+
+def _worker(st: Storage, stop: threading.Event, users: int, write_share: float,
+            lat: list) -> None:
+    rnd = random.Random()
+    n = st.questions_count()
+    while not stop.is_set():
+        uid = rnd.randrange(users)
+        t0 = time.perf_counter()
+        if rnd.random() < write_share:
+            if rnd.random() < 0.5:
+                st.set_interest(uid, rnd.choice(dao.CATEGORIES))
+            else:
+                st.toggle_favorite(uid, "course", rnd.randrange(1, 12))
+        else:
+            lang = st.get_lang(uid)
+            q = st.get_question_by_index(rnd.randrange(n), lang=lang)
+            st.get_answers_for_question(q[0], lang=lang)
+            st.prof_by_cat(rnd.choice(dao.CATEGORIES))
+            st.list_favorites(uid)
+        lat.append(time.perf_counter() - t0)
+
+
+def _p(vals: list, q: float) -> float:
+    if not vals:
+        return 0.0
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(q * len(vals)))] * 1000
+
+
+def run(kind: str, seconds: float, threads: int, users: int, write_share: float) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        dao.close_pool()
+        dao.DB_PATH = os.path.join(tmp, "bench.db")
+        dao.CONTENT_DB_PATH = ""
+        st = STORAGES[kind]()
+        st.init_db()
+        st.seed_data()
+        for uid in range(users):
+            st.add_user(uid, f"user{uid}")
+        st.flush_writes()
+
+        stop = threading.Event()
+        lat: list = []
+        workers = [
+            threading.Thread(target=_worker, args=(st, stop, users, write_share, lat))
+            for _ in range(threads)
+        ]
+        for th in workers:
+            th.start()
+        time.sleep(seconds)
+        stop.set()
+        for th in workers:
+            th.join()
+        st.close()
+
+    print(
+        f"{kind:8} {len(lat) / seconds:9.0f} ops/s "
+        f"(p50 {_p(lat, 0.5):6.3f} ms, p99 {_p(lat, 0.99):7.3f} ms)"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("storages", nargs="*", default=["sqlite", "memory"])
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--writes", type=float, default=0.1, help="доля операций записи")
+    args = ap.parse_args()
+    for kind in args.storages:
+        run(kind, args.seconds, args.threads, args.users, args.writes)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 # career_bot.py
 import os
 import asyncio
-import json
-from typing import Dict, List, Tuple
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
 from aiogram import Bot, Dispatcher
 from aiogram.filters import CommandStart, Command
@@ -16,10 +16,24 @@ from aiogram.types import (
 )
 
 import i18n
-import db_dao as dao
+import db_async as adao
+from scoring import EARLY_FINISH
+from sessions import MODE_FEEDBACK, MODE_TEST
+from test_protocol import PREFIX as PROGRESS_PREFIX, ProgressCodec
+from user_context import UserContext, UserLoaderMiddleware
 
 BOT_TOKEN = os.getenv("BOT_TOKEN", "8592571477:AAEDSYMcIOrOrRTMmQcp4tGaOGespVA6M34")
 ADMIN_CHAT_ID = int(os.getenv("ADMIN_CHAT_ID", "0"))
+# daily — один совет на пользователя в день, random — новый на каждое нажатие
+TIP_MODE = os.getenv("TIP_MODE", "daily")
+# 1 — прогресс теста в callback_data кнопок (test_protocol.py), без сессий на сервере
+STATELESS_TEST = os.getenv("CAREER_BOT_STATELESS_TEST", "0") == "1"
+# ключ подписи только из окружения: токен-заглушка из кода общеизвестен
+CALLBACK_SECRET = os.getenv("CAREER_BOT_CALLBACK_SECRET") or os.getenv("BOT_TOKEN")
+if STATELESS_TEST and not CALLBACK_SECRET:
+    raise RuntimeError(
+        "CAREER_BOT_STATELESS_TEST=1 needs CAREER_BOT_CALLBACK_SECRET or BOT_TOKEN in the environment"
+    )
 
 LANGS = {"ru": "Русский", "en": "English", "az": "Azərbaycan"}
 
@@ -31,6 +45,12 @@ CATEGORY_TITLES = {
     "green": {"ru": "Green/ESG", "en": "Green/ESG", "az": "Green/ESG"},
 }
 
+# порядок категорий в векторах баллов (сессии, callback_data, test_results)
+CATEGORY_ORDER = tuple(CATEGORY_TITLES)
+if CATEGORY_ORDER != adao.CATEGORIES:
+    raise RuntimeError(f"CATEGORY_TITLES order {CATEGORY_ORDER} != storage {adao.CATEGORIES}")
+ZERO_SCORES = (0,) * len(CATEGORY_ORDER)
+
 ICONS = {
     "creative": "🎨",
     "tech": "💻",
@@ -40,6 +60,9 @@ ICONS = {
 }
 
 
+_progress = ProgressCodec(CALLBACK_SECRET) if CALLBACK_SECRET else None
+
+
 # ---------- Helpers ----------
 
 def t(lang: str, key: str) -> str:
@@ -112,10 +135,11 @@ def categories_inline_kb(lang: str, prefix: str = "cat"):
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def create_answers_kb(lang: str, answers: List[Tuple[int, str]]) -> InlineKeyboardMarkup:
+def create_answers_kb(lang: str, answers: List[Tuple[str, str]]) -> InlineKeyboardMarkup:
+    """answers: (callback_data, текст)."""
     rows = []
-    for aid, text in answers:
-        rows.append([InlineKeyboardButton(text=text, callback_data=f"ans:{aid}")])
+    for data, text in answers:
+        rows.append([InlineKeyboardButton(text=text, callback_data=data)])
     rows.append(
         [InlineKeyboardButton(text=t(lang, "back_menu"), callback_data="nav:menu")]
     )
@@ -149,91 +173,146 @@ def format_scores(scores: Dict[str, int], lang: str) -> Tuple[str, List[str]]:
     return ("\n\n".join(lines), [k for k, _ in ordered])
 
 
+def format_result_line(scores: Dict[str, int], lang: str) -> str:
+    """Итоги одной строкой для профиля: категории по убыванию баллов."""
+    ordered = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    return ", ".join(f"{cat_title(lang, k)} {v}" for k, v in ordered)
+
+
 def self_escape(s: str) -> str:
     # простая защита от html в тексте вопросов
     return s.replace("<", "&lt;").replace(">", "&gt;")
 
 
-# ---------- State ----------
+# ---------- Question render cache ----------
+# текст и клавиатура вопроса одинаковы для всех пользователей с этим языком:
+# собираем один раз на (idx, lang) и сбрасываем при смене слепка контента
+
+class RenderedQuestion(NamedTuple):
+    text: str
+    kb: InlineKeyboardMarkup
+    answers: Tuple[Tuple, ...]  # (id, текст, веса...) — для stateless-кнопок
+
+
+_render_src = None  # (слепок, поколение переводов), из которых собран кэш
+_render_cache: Dict[Tuple[int, str], RenderedQuestion] = {}
+
+
+def render_question(snap, idx: int, lang: str) -> Optional[RenderedQuestion]:
+    """Готовый вопрос из кэша; None — вопросов больше нет."""
+    global _render_src
+    src = _render_src
+    if src is None or src[0] is not snap or src[1] != i18n.generation:
+        _render_cache.clear()
+        _render_src = (snap, i18n.generation)
+    key = (idx, lang)
+    rendered = _render_cache.get(key)
+    if rendered is not None:
+        return rendered
+    q = snap.question(idx, lang)
+    if not q:
+        return None
+    qid, text = q
+    answers = tuple(snap.answers(qid, lang))
+    rendered = RenderedQuestion(
+        f"{t(lang, 'question')} {idx + 1}/{snap.questions_count}\n\n{self_escape(text)}",
+        create_answers_kb(lang, [(f"ans:{a[0]}", a[1]) for a in answers]),
+        answers,
+    )
+    _render_cache[key] = rendered
+    return rendered
+
 
-user_scores: Dict[int, Dict[str, int]] = {}
-user_qidx: Dict[int, int] = {}
+async def prerender_questions() -> int:
+    """Прогрев кэша на старте: все вопросы на всех языках."""
+    snap = await adao.content()
+    for lang in LANGS:
+        for idx in sorted(snap.questions_by_idx):
+            render_question(snap, idx, lang)
+    return len(_render_cache)
 
 
 # ---------- Handlers ----------
 
-async def on_start(message: Message):
-    dao.add_user(message.from_user.id, message.from_user.full_name)
-    u = dao.get_user(message.from_user.id)
-    lang = u[5] if u else None
-    if not lang:
+async def on_start(message: Message, user: UserContext):
+    await user.ensure(message.from_user.full_name)
+    if not user.lang_code:
         await message.answer(t("ru", "pick_lang"), reply_markup=lang_inline_kb(None))
         return
+    lang = user.lang
     await message.answer(t(lang, "greet"), reply_markup=main_menu_kb(lang))
     await message.answer(t(lang, "choose_below"))
 
 
-async def cb_lang(callback: CallbackQuery):
+async def cb_lang(callback: CallbackQuery, user: UserContext):
     code = callback.data.split(":", 1)[1]
     if code not in LANGS:
         await callback.answer()
         return
-    dao.set_lang(callback.from_user.id, code)
+    await user.set_lang(code)
     await callback.message.answer(t(code, "lang_set").format(lang=LANGS[code]))
     await callback.message.answer(t(code, "greet"), reply_markup=main_menu_kb(code))
     await callback.answer()
 
 
-async def nav_cb(callback: CallbackQuery):
+async def nav_cb(callback: CallbackQuery, user: UserContext):
     if callback.data != "nav:menu":
         await callback.answer()
         return
-    lang = dao.get_lang(callback.from_user.id)
+    lang = user.lang
     await callback.message.answer(t(lang, "greet"), reply_markup=main_menu_kb(lang))
     await callback.answer()
 
 
-async def cmd_lang(message: Message):
-    u = dao.get_user(message.from_user.id)
-    cur = u[5] if u else None
+async def cmd_lang(message: Message, user: UserContext):
+    cur = user.lang_code
     await message.answer(t(cur or "ru", "lang_title"), reply_markup=lang_inline_kb(cur))
 
 
-async def cmd_help(message: Message):
-    lang = dao.get_lang(message.from_user.id)
+async def cmd_help(message: Message, user: UserContext):
+    lang = user.lang
     await message.answer(t(lang, "help"), reply_markup=main_menu_kb(lang))
 
 
-async def cmd_about(message: Message):
-    lang = dao.get_lang(message.from_user.id)
-    await message.answer(t(lang, "about"))
+async def cmd_about(message: Message, user: UserContext):
+    await message.answer(t(user.lang, "about"))
 
 
-async def cmd_id(message: Message):
-    lang = dao.get_lang(message.from_user.id)
+async def cmd_id(message: Message, user: UserContext):
     await message.answer(
-        f"{t(lang, 'id_label')} <code>{message.from_user.id}</code>",
+        f"{t(user.lang, 'id_label')} <code>{message.from_user.id}</code>",
         parse_mode="HTML",
     )
 
 
-async def cmd_reset(message: Message):
-    lang = dao.get_lang(message.from_user.id)
-    dao.reset_user(message.from_user.id)
-    await message.answer(t(lang, "reset_done"))
-    await on_start(message)
+async def cmd_reload(message: Message, user: UserContext):
+    """Перечитать переводы (после compile_translations.py) — только из чата админа."""
+    if not ADMIN_CHAT_ID or message.chat.id != ADMIN_CHAT_ID:
+        await message.answer(t(user.lang, "no_data"))
+        return
+    i18n.reload()
+    # кэш вопросов и роутер ключуются по i18n.generation — прогреваем заново
+    rendered = await prerender_questions()
+    build_router()
+    await message.answer(f"Translations reloaded (generation {i18n.generation}, {rendered} renders)")
+
 
+async def cmd_reset(message: Message, user: UserContext):
+    await user.reset()
+    await message.answer(t(user.lang, "reset_done"))
+    await on_start(message, user)
 
-async def catalog_cmd(message: Message):
-    lang = dao.get_lang(message.from_user.id)
+
+async def catalog_cmd(message: Message, user: UserContext):
+    lang = user.lang
     await message.answer(t(lang, "choose_dir"), reply_markup=categories_inline_kb(lang))
 
 
-async def cat_cb(callback: CallbackQuery):
-    lang = dao.get_lang(callback.from_user.id)
+async def cat_cb(callback: CallbackQuery, user: UserContext):
+    lang = user.lang
     code = callback.data.split(":", 1)[1]
-    dao.set_interest(callback.from_user.id, code)
-    profs = dao.prof_by_cat(code)
+    await user.set_interest(code)
+    profs = await adao.prof_by_cat(code)
     if not profs:
         await callback.message.answer(t(lang, "no_data"), reply_markup=None)
         await callback.answer()
@@ -266,101 +345,123 @@ async def cat_cb(callback: CallbackQuery):
 
 # ----- Test flow -----
 
-async def start_test(message: Message):
-    lang = dao.get_lang(message.from_user.id)
-    cnt = dao.questions_count()
+async def start_test(message: Message, user: UserContext):
+    lang = user.lang
+    cnt = await adao.questions_count()
     if cnt == 0:
         await message.answer(t(lang, "test_unavail"))
         return
-    user_scores[message.from_user.id] = {
-        "creative": 0,
-        "tech": 0,
-        "social": 0,
-        "business": 0,
-        "green": 0,
-    }
-    user_qidx[message.from_user.id] = 0
-    await send_question(message.from_user.id, message)
-
-
-async def send_question(user_id: int, origin_message: Message):
-    lang = dao.get_lang(user_id)
-    idx = user_qidx.get(user_id, 0)
-
-    # берём вопрос уже с учётом языка
-    q = dao.get_question_by_index(idx, lang=lang)
-    if not q:
-        await finish_test(user_id, origin_message)
+    if STATELESS_TEST:
+        await send_question(user, message, 0, ZERO_SCORES)
+        return
+    await adao.start_session(user.user_id, MODE_TEST)
+    await send_question(user, message, 0)
+
+
+async def send_question(
+    user: UserContext,
+    origin_message: Message,
+    idx: int,
+    scores: Optional[Sequence[int]] = None,
+):
+    """scores — баллы до этого вопроса в stateless-режиме (иначе они в сессии)."""
+    lang = user.lang
+
+    # вопрос уже с учётом языка — из кэша отрисовки
+    rendered = render_question(await adao.content(), idx, lang)
+    if rendered is None:
+        await finish_test(user, origin_message, scores)
         return
 
-    qid, text = q
-    answers = dao.get_answers_for_question(qid, lang=lang)
-    kb_answers = [(a[0], a[1]) for a in answers]
-
-    kb = create_answers_kb(lang, kb_answers)
-    await origin_message.answer(
-        f"{t(lang, 'question')} {idx + 1}/{dao.questions_count()}\n\n{self_escape(text)}",
-        reply_markup=kb,
-    )
+    kb = rendered.kb
+    if scores is not None:
+        # у каждой кнопки — баллы с учётом её ответа, клавиатура своя
+        kb = create_answers_kb(
+            lang,
+            [
+                (
+                    _progress.encode(
+                        user.user_id, idx, [s + (w or 0) for s, w in zip(scores, a[2:])]
+                    ),
+                    a[1],
+                )
+                for a in rendered.answers
+            ],
+        )
+    await origin_message.answer(rendered.text, reply_markup=kb)
 
 
-async def answer_callback(callback: CallbackQuery):
+async def answer_callback(callback: CallbackQuery, user: UserContext):
     data = callback.data
     if not data.startswith("ans:"):
         await callback.answer()
         return
     aid = int(data.split(":", 1)[1])
-    uid = callback.from_user.id
-    lang = dao.get_lang(uid)
-    weights = dao.get_answer_weights(aid)
+    uid = user.user_id
+    weights = await adao.get_answer_row(aid)
     if not weights:
-        await callback.answer(t(lang, "ok"))
+        await callback.answer(t(user.lang, "ok"))
         return
-    sc = user_scores.get(
-        uid, {"creative": 0, "tech": 0, "social": 0, "business": 0, "green": 0}
-    )
-    for k, v in weights.items():
-        sc[k] = sc.get(k, 0) + (v or 0)
-    user_scores[uid] = sc
-    user_qidx[uid] = user_qidx.get(uid, 0) + 1
+    session = await adao.record_answer(uid, aid, weights)
+    if session is None:
+        # сессия истекла или тест не начат — начинаем заново
+        session = await adao.start_session(uid, MODE_TEST)
     await callback.answer()
-    await send_question(uid, callback.message)
+    if EARLY_FINISH != "off" and await adao.test_decided(session.scores, session.qidx):
+        await finish_test(user, callback.message)
+        return
+    await send_question(user, callback.message, session.qidx)
 
 
-async def finish_test(user_id: int, origin_message: Message):
-    lang = dao.get_lang(user_id)
-    scores = user_scores.get(
-        user_id, {"creative": 0, "tech": 0, "social": 0, "business": 0, "green": 0}
-    )
-    text, order = format_scores(scores, lang)
-    dao.save_test_scores(user_id, json.dumps(scores))
+async def progress_callback(callback: CallbackQuery, user: UserContext):
+    """Ответ в stateless-режиме: всё состояние — в callback_data."""
+    state = _progress.decode(user.user_id, callback.data) if _progress else None
+    await callback.answer()
+    if state is None:
+        # чужая или испорченная кнопка — начинаем заново
+        await send_question(user, callback.message, 0, ZERO_SCORES)
+        return
+    qidx, scores = state
+    if EARLY_FINISH != "off" and await adao.test_decided(scores, qidx + 1):
+        await finish_test(user, callback.message, scores)
+        return
+    await send_question(user, callback.message, qidx + 1, scores)
+
+
+async def finish_test(
+    user: UserContext, origin_message: Message, progress: Optional[Sequence[int]] = None
+):
+    if progress is not None:
+        # stateless: баллы пришли с кнопкой, ответы не сохраняются
+        answers = ()
+        scores = dict(zip(CATEGORY_ORDER, progress))
+    else:
+        session = await adao.finish_session(user.user_id, MODE_TEST)
+        answers = session.answers if session else ()
+        scores = await adao.score_answers(answers)
+    text, order = format_scores(scores, user.lang)
+    await user.save_test_result(scores, answers)
     await origin_message.answer(text, parse_mode="HTML")
-    user_scores.pop(user_id, None)
-    user_qidx.pop(user_id, None)
 
 
 # ---------- Utilities / Favorites / Courses ----------
 
-async def send_feedback(message: Message):
-    lang = dao.get_lang(message.from_user.id)
-    await message.answer(t(lang, "send_feedback"))
-    # примитивное состояние: -999 означает "ждём текст отзыва"
-    user_qidx[message.from_user.id] = -999
+async def send_feedback(message: Message, user: UserContext):
+    await message.answer(t(user.lang, "send_feedback"))
+    await adao.start_session(user.user_id, MODE_FEEDBACK)
 
 
-async def cmd_courses(message: Message):
-    await show_courses_for_user(message)
+async def cmd_courses(message: Message, user: UserContext):
+    await show_courses_for_user(message, user)
 
 
-async def show_courses_for_user(message: Message):
-    uid = message.from_user.id
-    lang = dao.get_lang(uid)
-    u = dao.get_user(uid)
-    if not u or not u[3]:
+async def show_courses_for_user(message: Message, user: UserContext):
+    lang = user.lang
+    if not user.interest:
         await message.answer(t(lang, "no_interest"))
         return
-    cat = u[3]
-    courses = dao.free_courses_by_cat(cat, limit=5)
+    cat = user.interest
+    courses = await adao.free_courses_by_cat(cat, limit=5)
     if not courses:
         await message.answer(t(lang, "no_data"))
         return
@@ -371,10 +472,9 @@ async def show_courses_for_user(message: Message):
         await message.answer(text, parse_mode="HTML")
 
 
-async def cmd_favorites(message: Message):
-    uid = message.from_user.id
-    lang = dao.get_lang(uid)
-    favs = dao.list_favorites(uid)
+async def cmd_favorites(message: Message, user: UserContext):
+    lang = user.lang
+    favs = await adao.list_favorites(user.user_id)
     if not favs["profession"] and not favs["course"]:
         await message.answer(t(lang, "fav_empty"))
         return
@@ -382,43 +482,47 @@ async def cmd_favorites(message: Message):
     if favs["profession"]:
         lines.append("\n" + t(lang, "fav_prof_header"))
         for p in favs["profession"]:
-            pid, name, category, link = p
-            lines.append(f"• {name} ({cat_title(lang, category)})")
+            lines.append(f"• {p.title} ({cat_title(lang, p.category)})")
     if favs["course"]:
         lines.append("\n" + t(lang, "fav_courses_header"))
         for c in favs["course"]:
-            cid, title, category, link = c
-            lines.append(f"• {title} — {link}")
+            lines.append(f"• {c.title} — {c.link}")
     await message.answer("\n".join(lines))
 
 
-async def cmd_fav_courses(message: Message):
-    uid = message.from_user.id
-    lang = dao.get_lang(uid)
-    rows = dao.list_fav_courses_only(uid)
+async def cmd_fav_courses(message: Message, user: UserContext):
+    lang = user.lang
+    rows = await adao.list_fav_courses_only(user.user_id)
     if not rows:
         await message.answer(t(lang, "fav_empty"))
         return
     lines = [t(lang, "fav_courses_header")]
-    for cid, title, category, link in rows:
-        lines.append(f"• {title} — {link}")
+    for c in rows:
+        lines.append(f"• {c.title} — {c.link}")
     await message.answer("\n".join(lines))
 
 
-async def cmd_roles(message: Message):
-    lang = dao.get_lang(message.from_user.id)
+async def cmd_roles(message: Message, user: UserContext):
+    lang = user.lang
     lines = [t(lang, "choose_dir")]
     for code in CATEGORY_TITLES.keys():
         lines.append(f"• {cat_title(lang, code)}")
     await message.answer("\n".join(lines), reply_markup=categories_inline_kb(lang))
 
 
-async def handle_text(message: Message):
-    uid = message.from_user.id
-    lang = dao.get_lang(uid)
+async def handle_text(message: Message, user: UserContext):
+    uid = user.user_id
+    lang = user.lang
+
+    # кнопки — на любом языке, одним поиском в словаре, без обращения к БД
+    handler = route_text(lang, message.text)
+    if handler is not None:
+        await handler(message, user)
+        return
 
-    # Если ждём отзыв
-    if user_qidx.get(uid, None) == -999:
+    # Если ждём отзыв: сессию мог открыть любой воркер, поэтому спрашиваем
+    # хранилище (поиск по ключу в потоке-писателе)
+    if await adao.finish_session(uid, MODE_FEEDBACK):
         text = f"[Feedback] From: {message.from_user.full_name} ({uid})\n\n{message.text}"
         try:
             if ADMIN_CHAT_ID:
@@ -427,59 +531,113 @@ async def handle_text(message: Message):
             await message.answer(t(lang, "feedback_sent"))
         except Exception as e:
             await message.answer(t(lang, "feedback_sent") + f" ({e})")
-        user_qidx.pop(uid, None)
-        return
-
-    # кнопки
-    if message.text == t(lang, "catalog"):
-        await catalog_cmd(message)
-        return
-    if message.text == t(lang, "test") or message.text == "/test":
-        await start_test(message)
-        return
-    if message.text == t(lang, "courses"):
-        await show_courses_for_user(message)
-        return
-    if message.text == t(lang, "fav"):
-        await cmd_favorites(message)
-        return
-    if message.text == t(lang, "tip"):
-        await message.answer(t(lang, "today_tip") + "\n" + dao.random_tip(lang))
-        return
-    if message.text == t(lang, "profile"):
-        u = dao.get_user(uid)
-        if not u:
-            await message.answer(t(lang, "profile_not_found"))
-            return
-        # user: (user_id, name, age_group, interest, test_scores, lang)
-        scores = u[4] or ""
-        interest = u[3]
-        interest_title = cat_title(lang, interest) if interest else "-"
-        age_group = u[2] or "-"
-        text = (
-            f"{t(lang, 'profile_block')}\n\n"
-            f"{t(lang, 'id_label')} {uid}\n"
-            f"{t(lang, 'profile')}: {u[1]}\n"
-            f"{t(lang, 'age_saved')}: {age_group}\n"
-            f"{t(lang, 'choose_dir')}: {interest_title}\n"
-            f"{t(lang, 'itogi')}: {scores}"
-        )
-        await message.answer(text)
         return
 
     # fallback
     await message.answer(t(lang, "no_data"))
 
 
+async def send_tip(message: Message, user: UserContext):
+    lang = user.lang
+    if TIP_MODE == "random":
+        tip = await adao.random_tip(lang)
+    else:
+        tip = await adao.tip_of_the_day(user.user_id, lang)
+    await message.answer(t(lang, "today_tip") + "\n" + tip)
+
+
+async def show_profile(message: Message, user: UserContext):
+    uid = user.user_id
+    lang = user.lang
+    if not user.exists:
+        await message.answer(t(lang, "profile_not_found"))
+        return
+    result = await adao.latest_test_result(uid)
+    scores = format_result_line(result.as_dict(), lang) if result else "-"
+    interest = user.interest
+    interest_title = cat_title(lang, interest) if interest else "-"
+    age_group = user.age_group or "-"
+    text = (
+        f"{t(lang, 'profile_block')}\n\n"
+        f"{t(lang, 'id_label')} {uid}\n"
+        f"{t(lang, 'profile')}: {user.name}\n"
+        f"{t(lang, 'age_saved')}: {age_group}\n"
+        f"{t(lang, 'choose_dir')}: {interest_title}\n"
+        f"{t(lang, 'itogi')}: {scores}"
+    )
+    await message.answer(text)
+
+
+# ---------- Text router ----------
+# текст кнопки меню -> обработчик; собирается из i18n для всех языков
+# и пересобирается после i18n.reload()
+
+TEXT_ROUTES = {
+    "catalog": catalog_cmd,
+    "test": start_test,
+    "courses": show_courses_for_user,
+    "fav": cmd_favorites,
+    "tip": send_tip,
+    "profile": show_profile,
+}
+
+_router_gen = -1
+_routes_by_lang: Dict[Tuple[str, str], Callable] = {}  # (lang, текст) -> обработчик
+_routes_any: Dict[str, Callable] = {}  # текст на любом языке -> обработчик
+
+
+def build_router() -> int:
+    global _router_gen, _routes_by_lang, _routes_any
+    by_lang: Dict[Tuple[str, str], Callable] = {}
+    any_lang: Dict[str, Callable] = {"/test": start_test}
+    for lang in LANGS:
+        for key, handler in TEXT_ROUTES.items():
+            text = t(lang, key)
+            by_lang[(lang, text)] = handler
+            # совпадение текста у разных кнопок разных языков — побеждает первый
+            any_lang.setdefault(text, handler)
+    _routes_by_lang, _routes_any = by_lang, any_lang
+    _router_gen = i18n.generation
+    return len(by_lang)
+
+
+def route_text(lang: str, text: Optional[str]) -> Optional[Callable]:
+    if _router_gen != i18n.generation:
+        build_router()
+    handler = _routes_by_lang.get((lang or "ru", text))
+    return handler if handler is not None else _routes_any.get(text)
+
+
 # ---------- Runner ----------
 
 async def main():
-    dao.init_db()
-    dao.seed_data()
+    # старт с разбивкой по времени, чтобы видеть регрессии холодного старта
+    timings: List[Tuple[str, float]] = []
+    for stage, step in (
+        ("init_db", adao.init_db),
+        ("check_storage_profile", adao.check_storage_profile),
+        ("seed_data", adao.seed_data),
+        ("reload_content", adao.reload_content),
+        ("prerender_questions", prerender_questions),
+        ("build_router", build_router),
+        ("purge_sessions", adao.purge_sessions),
+    ):
+        t0 = time.perf_counter()
+        result = step()
+        if asyncio.iscoroutine(result):
+            result = await result
+        timings.append((stage, time.perf_counter() - t0))
+        if stage == "init_db":
+            timings.extend(result)  # по миграциям
+    print("Startup: " + ", ".join(f"{name} {sec * 1000:.1f} ms" for name, sec in timings))
 
     bot = Bot(BOT_TOKEN)
     dp = Dispatcher()
 
+    # один раз загружаем профиль отправителя на апдейт
+    dp.message.middleware(UserLoaderMiddleware())
+    dp.callback_query.middleware(UserLoaderMiddleware())
+
     # callbacks
     dp.message.register(on_start, CommandStart())
     dp.callback_query.register(cb_lang, lambda c: c.data and c.data.startswith("lang:"))
@@ -488,6 +646,9 @@ async def main():
     dp.callback_query.register(
         answer_callback, lambda c: c.data and c.data.startswith("ans:")
     )
+    dp.callback_query.register(
+        progress_callback, lambda c: c.data and c.data.startswith(PROGRESS_PREFIX)
+    )
 
     # commands
     dp.message.register(cmd_lang, Command(commands=["lang"]))
@@ -495,6 +656,7 @@ async def main():
     dp.message.register(cmd_about, Command(commands=["about"]))
     dp.message.register(cmd_id, Command(commands=["id"]))
     dp.message.register(cmd_reset, Command(commands=["reset"]))
+    dp.message.register(cmd_reload, Command(commands=["reload"]))
     dp.message.register(cmd_courses, Command(commands=["courses"]))
     dp.message.register(cmd_favorites, Command(commands=["favorites"]))
     dp.message.register(cmd_fav_courses, Command(commands=["fav_courses"]))
@@ -506,7 +668,11 @@ async def main():
     dp.message.register(handle_text)
 
     print("Bot started")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        print("Sessions: " + ", ".join(f"{k} {v}" for k, v in adao.session_stats().items()))
+        await adao.close()
 
 
 if __name__ == "__main__":
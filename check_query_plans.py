@@ -0,0 +1,175 @@
+# check_query_plans.py
+"""
+Проверка планов запросов DAO на «большом» каталоге.
+
+Создаёт временную БД, раздувает каталог до нескольких тысяч строк,
+вызывает функции db_dao, перехватывает их SQL и прогоняет через
+EXPLAIN QUERY PLAN. Полный проход таблицы (SCAN) — ошибка, код выхода 1.
+Чтения каталога обслуживает слепок контента без SQL; проверяются запросы
+его загрузки: проход целиком у них by design, а сортировка (TEMP B-TREE) —
+ошибка, если не разрешена явно. Вызов из CALLS, не выполнивший ни одного
+запроса, — тоже ошибка: проверять у него нечего.
+
+    python check_query_plans.py [--rows 5000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+from typing import Callable, Dict, List, Tuple
+
+import db_dao as dao
+
+# запросы, которым полный проход разрешён (с причиной)
+ALLOWED_SCANS: Dict[str, str] = {}
+
+# таблицы, которым при загрузке слепка разрешена сортировка (с причиной)
+SNAPSHOT_SORTS: Dict[str, str] = {
+    "professions": "ORDER BY name: индекса по имени нет, сортировка раз на загрузку",
+}
+
+CALLS: List[Tuple[str, Callable[[], object]]] = [
+    ("get_user", lambda: dao.get_user(42)),
+    ("get_lang", lambda: (dao._user_cache.clear(), dao.get_lang(42))),
+    ("add_user", lambda: dao.add_user(42, "Check")),
+    ("set_age", lambda: dao.set_age(42, "18-24")),
+    ("set_interest", lambda: dao.set_interest(42, "tech")),
+    ("save_test_result", lambda: dao.save_test_result(42, {"tech": 3})),
+    ("latest_test_result", lambda: dao.latest_test_result(42)),
+    ("test_results_history", lambda: dao.test_results_history(42)),
+    ("top_category_counts", lambda: dao.top_category_counts(0)),
+    ("results_page", lambda: dao.results_page(0, 100)),
+    ("save_rescored", lambda: dao.save_rescored(
+        [(0, 3, 0, 0, 0, "tech", "creative", 1)], "check", 1, 0)),
+    ("job_cursor", lambda: dao.job_cursor("check")),
+    ("save_session", lambda: dao.save_session((42, 1, 3, b"", b"", 0, 0))),
+    ("load_session", lambda: dao.load_session(42)),
+    ("purge_sessions", lambda: dao.purge_sessions(100)),
+    ("set_lang", lambda: dao.set_lang(42, "en")),
+    ("toggle_favorite", lambda: dao.toggle_favorite(42, "course", 7)),
+    ("favorite_ids", lambda: (dao._fav_cache.clear(), dao.favorite_ids(1000))),
+    ("reset_user", lambda: dao.reset_user(42)),
+]
+
+_DML = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def _inflate(path: str, rows: int) -> None:
+    cats = dao.CATEGORIES
+    conn = sqlite3.connect(path)
+    dao._register_functions(conn)  # триггеры courses вызывают price_tier()
+    with conn:
+        conn.executemany(
+            "INSERT INTO professions (category, name, description, domain) VALUES (?, ?, ?, ?)",
+            (
+                (cats[i % len(cats)], f"Profession {i}", "desc", f"domain{i % 50}")
+                for i in range(rows)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO courses (title, category, link, level) VALUES (?, ?, ?, ?)",
+            (
+                (f"Course {i}", cats[i % len(cats)], f"https://example.org/{i}",
+                 "free" if i % 3 else "paid")
+                for i in range(rows)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO tips (text) VALUES (?)", ((f"Tip {i}",) for i in range(rows))
+        )
+        conn.executemany(
+            "INSERT INTO questions (order_idx, text) VALUES (?, ?)",
+            ((100 + i, f"Question {i}") for i in range(rows // 4)),
+        )
+        conn.executemany(
+            "INSERT INTO answers (question_id, position, text) VALUES (?, ?, ?)",
+            ((1 + i % (rows // 4), 100 + i // (rows // 4), f"Answer {i}") for i in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO users (user_id, name) VALUES (?, ?)",
+            ((1000 + i, f"user{i}") for i in range(rows)),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO favorites (user_id, entity_type, entity_id) VALUES (?, ?, ?)",
+            (
+                (1000 + i % 500, "course" if i % 2 else "profession", 1 + i)
+                for i in range(rows)
+            ),
+        )
+    conn.close()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN для запросов db_dao")
+    ap.add_argument("--rows", type=int, default=5000)
+    args = ap.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        traced: List[str] = []
+        orig_connect = dao.db_connect
+
+        def traced_connect(*args, **kwargs):
+            conn = orig_connect(*args, **kwargs)
+            conn.set_trace_callback(traced.append)
+            return conn
+
+        dao.close_pool()
+        dao.db_connect = traced_connect
+        dao.DB_PATH = os.path.join(tmp, "plans.db")
+        dao.CONTENT_DB_PATH = ""  # каталог раздувается в том же файле
+        dao.init_db()
+        dao.seed_data()
+        _inflate(dao.DB_PATH, args.rows)
+        dao.CONTENT_CHECK_SEC = float("inf")
+        explain = sqlite3.connect(dao.DB_PATH)
+
+        traced.clear()
+        dao.reload_content()
+        for sql in traced:
+            if not sql.lstrip().upper().startswith(_DML):
+                continue
+            plan = [r[3] for r in explain.execute("EXPLAIN QUERY PLAN " + sql)]
+            tables = [p.split()[1] for p in plan if p.startswith(("SCAN ", "SEARCH "))]
+            status = "ok"
+            if any("TEMP B-TREE" in p for p in plan):
+                allowed = [SNAPSHOT_SORTS[t] for t in tables if t in SNAPSHOT_SORTS]
+                if allowed:
+                    status = f"allowed ({allowed[0]})"
+                else:
+                    status = "FAIL"
+                    failures += 1
+            print(f"[{status}] snapshot: " + " | ".join(plan))
+
+        for name, call in CALLS:
+            traced.clear()
+            call()
+            dao.flush_writes()  # отложенные записи профиля — тоже в трассу
+            statements = [s for s in traced if s.lstrip().upper().startswith(_DML)]
+            if not statements:
+                print(f"[FAIL] {name}: no SQL (served from memory?)")
+                failures += 1
+            for sql in statements:
+                plan = [r[3] for r in explain.execute("EXPLAIN QUERY PLAN " + sql)]
+                scans = [p for p in plan if p.startswith("SCAN ")]
+                status = "ok"
+                if scans:
+                    if name in ALLOWED_SCANS:
+                        status = f"allowed ({ALLOWED_SCANS[name]})"
+                    else:
+                        status = "FAIL"
+                        failures += 1
+                print(f"[{status}] {name}: " + " | ".join(plan))
+        explain.close()
+        dao.db_connect = orig_connect
+        dao.close_pool()
+
+    if failures:
+        print(f"{failures} statement(s) failed the plan check", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+# check_storage.py
+"""
+Проверка соответствия хранилищ интерфейсу storage.Storage.
+
+Один и тот же сценарий (пользователи, избранное, контент, тест) гоняется
+на каждом хранилище и на эталонных ожиданиях; затем результаты хранилищ
+сравниваются между собой. Любое расхождение — код выхода 1.
+
+    python check_storage.py [sqlite memory]
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+from typing import Callable, Dict, List, Tuple
+
+import db_dao as dao
+from sessions import MODE_FEEDBACK, MODE_TEST, SessionStore
+from storage import STORAGES, Storage
+
+LANGS = ["ru", "en", "az"]
+
+
+def _expect(ok: bool, what: str, failures: List[str]) -> None:
+    if not ok:
+        failures.append(what)
+
+
+def scenario(st: Storage, failures: List[str]) -> List[Tuple[str, object]]:
+    """Прогон операций; возвращает [(операция, результат)] для сравнения хранилищ."""
+    out: List[Tuple[str, object]] = []
+
+    def rec(name: str, fn: Callable[[], object]) -> object:
+        res = fn()
+        out.append((name, res))
+        return res
+
+    st.init_db()
+    st.seed_data()
+    st.reload_content()
+
+    # users
+    _expect(rec("get_user(missing)", lambda: st.get_user(1)) is None, "no user", failures)
+    _expect(rec("get_lang(missing)", lambda: st.get_lang(1)) == "ru", "default lang", failures)
+    st.set_interest(1, "tech")  # UPDATE несуществующего — без эффекта
+    _expect(st.get_user(1) is None, "set_* does not create a user", failures)
+    st.add_user(1, "Ann", "18-24")
+    st.add_user(1, "Anna", "25-34")  # повторный add_user меняет только имя
+    st.set_lang(1, "en")
+    st.set_interest(1, "tech")
+    st.flush_writes()
+    row = rec("get_user", lambda: st.get_user(1))
+    want = (1, "Anna", "18-24", "tech", "en")
+    _expect(row == want, f"user row {row!r}", failures)
+    _expect(st.get_lang(1) == "en", "get_lang after set_lang", failures)
+
+    # test results
+    _expect(st.latest_test_result(1) is None, "no results yet", failures)
+    st.save_test_result(1, {"tech": 3, "social": 3, "green": 1}, created_at=100)
+    last = st.save_test_result(1, {"creative": 5, "business": 2}, created_at=200)
+    _expect(
+        (last.scores, last.top1, last.top2) == ((5, 0, 0, 2, 0), "creative", "business"),
+        f"saved result {last!r}",
+        failures,
+    )
+    _expect(st.latest_test_result(1) == last, "latest result", failures)
+    hist = st.test_results_history(1)
+    rec("test_results_history", lambda: [(r.created_at, r.scores, r.top1, r.top2) for r in hist])
+    _expect(
+        [(r.top1, r.top2) for r in hist] == [("creative", "business"), ("tech", "social")],
+        f"history {hist!r}",
+        failures,
+    )
+
+    # test sessions: переживают пересоздание in-memory слоя, брошенные — удаляются
+    ss = SessionStore(st)
+    ss.start(1, MODE_TEST)
+    ss.record_answer(1, 11, (0, 2, 0, 0, 1))
+    ss.record_answer(1, 12, (0, 1, 0, 0, 0))
+    st.flush_writes()
+    s = SessionStore(st).get(1)
+    _expect(
+        s is not None and (s.qidx, list(s.scores), list(s.answers)) == (2, [0, 3, 0, 0, 1], [11, 12]),
+        "session survives a fresh store",
+        failures,
+    )
+    _expect(ss.finish(1, MODE_FEEDBACK) is None, "finish checks the mode", failures)
+    done = ss.finish(1, MODE_TEST)
+    _expect(done is not None and done.score_dict()["tech"] == 3, "finish returns session", failures)
+    st.flush_writes()
+    _expect(SessionStore(st).get(1) is None, "finished session is gone", failures)
+    ss.start(2, MODE_FEEDBACK)
+    st.flush_writes()
+    # второй воркер над тем же хранилищем: копии в памяти не устаревают
+    other = SessionStore(st)
+    _expect(ss.get(3) is None and other.get(3) is None, "no session yet", failures)
+    other.start(3, MODE_FEEDBACK)
+    s = ss.get(3)
+    _expect(s is not None and s.mode == MODE_FEEDBACK, "sees another worker's session", failures)
+    other.start(3, MODE_TEST)
+    other.record_answer(3, 11, (0, 2, 0, 0, 1))
+    s = ss.get(3)
+    _expect(s is not None and list(s.answers) == [11], "cached session is refreshed", failures)
+    _expect(other.finish(3, MODE_TEST) is not None, "other worker finishes", failures)
+    _expect(ss.get(3) is None, "finished elsewhere is gone", failures)
+    st.flush_writes()
+    _expect(st.purge_sessions(2**31 - 1) == 1, "purge removes stale sessions", failures)
+    _expect(SessionStore(st).get(2) is None, "purged session is gone", failures)
+    rec("session_stats", lambda: {k: v for k, v in ss.stats().items() if k != "bytes"})
+
+    # favorites
+    course = st.courses_by_cat("tech")[0][0]
+    prof = st.prof_by_cat("tech")[0][0]
+    _expect(st.toggle_favorite(1, "course", course) is True, "toggle adds", failures)
+    _expect(st.toggle_favorite(1, "profession", prof) is True, "toggle adds profession", failures)
+    _expect(st.is_favorite(1, "course", course), "is_favorite after add", failures)
+    favs = rec("list_favorites", lambda: st.list_favorites(1))
+    ids = ([f.id for f in favs["course"]], [f.id for f in favs["profession"]])
+    _expect(ids == ([course], [prof]), f"list_favorites {favs!r}", failures)
+    _expect(st.list_fav_courses_only(1) == favs["course"], "list_fav_courses_only", failures)
+    _expect(st.toggle_favorite(1, "course", course) is False, "toggle removes", failures)
+    _expect(not st.is_favorite(1, "course", course), "is_favorite after remove", failures)
+    st.toggle_favorite(1, "course", course)
+    st.reset_user(1)
+    st.flush_writes()
+    _expect(st.favorite_ids(1) == frozenset(), "reset clears favorites", failures)
+    row = rec("get_user(reset)", lambda: st.get_user(1))
+    _expect(row == (1, "Anna", None, None, "en"), f"reset row {row!r}", failures)
+    _expect(st.latest_test_result(1) is None, "reset clears test results", failures)
+
+    # content
+    for cat in dao.CATEGORIES:
+        rec(f"prof_by_cat({cat})", lambda: st.prof_by_cat(cat))
+        rec(f"courses_by_cat({cat})", lambda: st.courses_by_cat(cat))
+        free = rec(f"free_courses({cat})", lambda: st.free_courses_by_cat(cat, limit=2))
+        _expect(len(free) <= 2, "free_courses_by_cat limit", failures)
+    rec("prof_by_domain", lambda: st.prof_by_domain("backend"))
+    day = datetime.date(2024, 1, 1)
+    for lang in LANGS:
+        tip = rec(f"tip_of_the_day({lang})", lambda: st.tip_of_the_day(1, lang, day))
+        _expect(tip == st.tip_of_the_day(1, lang, day), "tip_of_the_day is stable", failures)
+        _expect(bool(st.random_tip(lang)), "random_tip is not empty", failures)
+
+    # test
+    n = rec("questions_count", st.questions_count)
+    _expect(n > 0, "questions seeded", failures)
+    for idx in range(n):
+        for lang in LANGS:
+            q = rec(f"question({idx},{lang})", lambda: st.get_question_by_index(idx, lang))
+            answers = rec(
+                f"answers({idx},{lang})", lambda: st.get_answers_for_question(q[0], lang)
+            )
+            _expect(bool(answers), f"answers for question {idx}", failures)
+            for a in answers:
+                w = st.get_answer_weights(a[0])
+                _expect(w is not None and tuple(w.values()) == a[2:], "answer weights", failures)
+                _expect(st.get_answer_row(a[0]) == a[2:], "answer row", failures)
+    _expect(st.get_question_by_index(n + 100) is None, "missing question is None", failures)
+    _expect(st.get_answer_weights(-1) is None, "missing answer is None", failures)
+    _expect(st.get_answer_row(-1) is None, "missing answer row is None", failures)
+    st.close()
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Проверка хранилищ storage.py")
+    ap.add_argument("storages", nargs="*", default=sorted(STORAGES))
+    args = ap.parse_args()
+
+    results: Dict[str, List[Tuple[str, object]]] = {}
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        dao.close_pool()
+        dao.DB_PATH = os.path.join(tmp, "check.db")
+        dao.CONTENT_DB_PATH = ""
+        for kind in args.storages:
+            failures: List[str] = []
+            results[kind] = scenario(STORAGES[kind](), failures)
+            print(f"[{'FAIL' if failures else 'ok'}] {kind}")
+            for f in failures:
+                print(f"    {f}")
+            failed += bool(failures)
+
+    base_kind = args.storages[0]
+    for kind in args.storages[1:]:
+        diff = [
+            name
+            for (name, a), (_, b) in zip(results[base_kind], results[kind])
+            if a != b
+        ]
+        print(f"[{'FAIL' if diff else 'ok'}] {kind} == {base_kind}")
+        for name in diff[:20]:
+            print(f"    {name}")
+        failed += bool(diff)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
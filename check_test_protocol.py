@@ -0,0 +1,90 @@
+# check_test_protocol.py
+"""
+Проверка подписи прогресса теста в callback_data (test_protocol.py).
+
+Кодек обязан вернуть свою кнопку и отвергнуть всё остальное: испорченные
+данные, кнопку другого пользователя, подпись другим ключом, мусор. Крайние
+значения (последний вопрос, предельные баллы) обязаны влезать в лимит
+Telegram. Любое расхождение — код выхода 1.
+
+    python check_test_protocol.py
+"""
+import base64
+import struct
+import sys
+from typing import List
+
+import db_dao as dao
+from test_protocol import CALLBACK_LIMIT, PREFIX, ProgressCodec
+
+SCORES = (3, -1, 0, 7, 2)
+
+
+def _expect(ok: bool, what: str, failures: List[str]) -> None:
+    if not ok:
+        failures.append(what)
+
+
+def _raw(data: str) -> bytes:
+    token = data[len(PREFIX):]
+    return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+
+
+def _flip(data: str, pos: int) -> str:
+    """data с изменённым битом в байте pos (полезная нагрузка или подпись)."""
+    raw = bytearray(_raw(data))
+    raw[pos] ^= 1
+    return PREFIX + base64.urlsafe_b64encode(bytes(raw)).rstrip(b"=").decode()
+
+
+def main() -> int:
+    failures: List[str] = []
+    codec = ProgressCodec("check-secret")
+    data = codec.encode(42, 3, SCORES)
+
+    _expect(codec.decode(42, data) == (3, SCORES), "round trip", failures)
+    _expect(
+        ProgressCodec("check-secret").decode(42, data) == (3, SCORES),
+        "same key in another process",
+        failures,
+    )
+    _expect(codec.decode(43, data) is None, "another user's button is rejected", failures)
+    _expect(
+        ProgressCodec("other-secret").decode(42, data) is None,
+        "button signed with another key is rejected",
+        failures,
+    )
+    _expect(
+        ProgressCodec("").decode(42, data) is None, "empty key does not match", failures
+    )
+
+    tampered = [
+        pos for pos in range(len(_raw(data))) if codec.decode(42, _flip(data, pos)) is not None
+    ]
+    _expect(not tampered, f"tampered bytes accepted at {tampered}", failures)
+
+    for bad in ("", PREFIX, "ans:1", PREFIX + "!!!", PREFIX + "AAAA", data[:-4], data + "AA"):
+        _expect(codec.decode(42, bad) is None, f"garbage {bad!r} is rejected", failures)
+
+    # крайние значения: последний вопрос, предельные баллы int16
+    n = len(dao.CATEGORIES)
+    for qidx, scores in ((0xFFFF, (32767,) * n), (0, (-32768,) * n)):
+        edge = codec.encode(2**63 - 1, qidx, scores)
+        _expect(len(edge.encode()) <= CALLBACK_LIMIT, f"{len(edge)} bytes > limit", failures)
+        _expect(
+            codec.decode(2**63 - 1, edge) == (qidx, scores), f"edge round trip {qidx}", failures
+        )
+    try:
+        codec.encode(42, 0, (32768,) + (0,) * (n - 1))
+        failures.append("score out of int16 is encoded")
+    except struct.error:
+        pass
+
+    print(f"[{'FAIL' if failures else 'ok'}] test_protocol ({len(data)} bytes)")
+    for f in failures:
+        print(f"    {f}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
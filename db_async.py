@@ -0,0 +1,108 @@
+# db_async.py
+"""
+Асинхронный фасад над хранилищем (storage.py) для хендлеров aiogram.
+
+Чтения выполняются в пуле потоков размером с пул соединений, записи —
+в единственном потоке-писателе, поэтому медленный commit не блокирует
+event loop и не конкурирует с другими записями.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import db_dao as dao
+from sessions import SessionStore
+from storage import open_storage
+
+# хранилище выбирается CAREER_BOT_STORAGE (sqlite | memory)
+_store = open_storage()
+CATEGORIES = dao.CATEGORIES  # порядок категорий в векторах баллов
+_sessions = SessionStore(_store)
+
+_read_executor = ThreadPoolExecutor(
+    max_workers=dao.POOL_SIZE, thread_name_prefix="db-read"
+)
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+
+def _run_in(executor: ThreadPoolExecutor, fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    return wrapper
+
+
+def _reader(fn):
+    return _run_in(_read_executor, fn)
+
+
+def _writer(fn):
+    return _run_in(_write_executor, fn)
+
+
+# schema
+init_db = _writer(_store.init_db)
+seed_data = _writer(_store.seed_data)
+check_storage_profile = _reader(_store.check_storage_profile)
+
+# users
+add_user = _writer(_store.add_user)
+set_age = _writer(_store.set_age)
+set_interest = _writer(_store.set_interest)
+reset_user = _writer(_store.reset_user)
+set_lang = _writer(_store.set_lang)
+flush_writes = _writer(_store.flush_writes)
+get_user = _reader(_store.get_user)
+get_lang = _reader(_store.get_lang)
+
+# test results
+save_test_result = _writer(_store.save_test_result)
+latest_test_result = _reader(_store.latest_test_result)
+test_results_history = _reader(_store.test_results_history)
+
+# test sessions: все операции в потоке-писателе — так подгрузка из хранилища
+# и изменения одной сессии не обгоняют друг друга
+get_session = _writer(_sessions.get)
+start_session = _writer(_sessions.start)
+record_answer = _writer(_sessions.record_answer)
+finish_session = _writer(_sessions.finish)
+purge_sessions = _writer(_sessions.purge_expired)
+session_stats = _sessions.stats
+
+# content
+content = _reader(_store.content)
+reload_content = _reader(_store.reload_content)
+prof_by_cat = _reader(_store.prof_by_cat)
+prof_by_domain = _reader(_store.prof_by_domain)
+courses_by_cat = _reader(_store.courses_by_cat)
+free_courses_by_cat = _reader(_store.free_courses_by_cat)
+random_tip = _reader(_store.random_tip)
+tip_of_the_day = _reader(_store.tip_of_the_day)
+
+# favorites
+toggle_favorite = _writer(_store.toggle_favorite)
+favorite_ids = _reader(_store.favorite_ids)
+is_favorite = _reader(_store.is_favorite)
+list_favorites = _reader(_store.list_favorites)
+list_fav_courses_only = _reader(_store.list_fav_courses_only)
+
+# test
+questions_count = _reader(_store.questions_count)
+get_question_by_index = _reader(_store.get_question_by_index)
+get_answers_for_question = _reader(_store.get_answers_for_question)
+get_answer_weights = _reader(_store.get_answer_weights)
+get_answer_row = _reader(_store.get_answer_row)
+score_answers = _reader(_store.score_answers)
+test_decided = _reader(_store.test_decided)
+
+
+async def close() -> None:
+    """Дожидается незавершённых записей и закрывает пул соединений."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _write_executor.shutdown, True)
+    await loop.run_in_executor(None, _read_executor.shutdown, True)
+    _store.close()
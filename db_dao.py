@@ -1,1230 +1,2071 @@
 # db_dao.py
+import bisect
+import datetime
+import hashlib
+import itertools
+import json
+import logging
 import os
+import pathlib
+import random
 import sqlite3
-from contextlib import closing
-from typing import List, Tuple, Optional, Dict
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import (
+    Any, Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+)
 
 DB_PATH = os.getenv("CAREER_BOT_DB", "career_bot.db")
 
+# отдельный файл каталога и теста (пусто — те же таблицы в DB_PATH). Бот открывает
+# его только на чтение; с immutable SQLite не берёт блокировок и не проверяет
+# изменения, поэтому файл обновляют сидом/патчем при остановленном боте или
+# подменой копии (rename) — новый слепок подхватится по размеру и mtime файла.
+# Перейти с общей базы: скопировать career_bot.db в файл контента (id совпадут).
+CONTENT_DB_PATH = os.getenv("CAREER_BOT_CONTENT_DB", "")
+CONTENT_IMMUTABLE = os.getenv("CAREER_BOT_CONTENT_IMMUTABLE", "1") == "1"
+
+# пул соединений: N долгоживущих читателей + один писатель
+POOL_SIZE = int(os.getenv("CAREER_BOT_DB_POOL_SIZE", "4"))
+# соединение, простаивающее дольше этого (сек), переоткрывается; 0 — никогда
+POOL_IDLE_SEC = float(os.getenv("CAREER_BOT_DB_POOL_IDLE", "300"))
+STMT_CACHE_SIZE = 256
+
+# запись профилей и сессий: immediate — commit на каждое действие,
+# batched — группой раз в CAREER_BOT_DB_FLUSH_SEC или при CAREER_BOT_DB_BATCH_SIZE ключей
+# (быстрее, но при падении процесса теряется несохранённое окно; включается явно)
+DURABILITY = os.getenv("CAREER_BOT_DB_DURABILITY", "immediate")
+WRITE_BATCH_SIZE = int(os.getenv("CAREER_BOT_DB_BATCH_SIZE", "500"))
+WRITE_FLUSH_SEC = float(os.getenv("CAREER_BOT_DB_FLUSH_SEC", "0.1"))
+
+# как часто (сек) проверять, не поменялся ли контент в БД
+CONTENT_CHECK_SEC = float(os.getenv("CAREER_BOT_CONTENT_CHECK_SEC", "2"))
+
+# кэш профилей (get_user/get_lang): LRU + TTL, ограничен числом записей и объёмом
+USER_CACHE_SIZE = int(os.getenv("CAREER_BOT_USER_CACHE_SIZE", "100000"))
+USER_CACHE_TTL = float(os.getenv("CAREER_BOT_USER_CACHE_TTL", "600"))
+USER_CACHE_MAX_BYTES = int(
+    os.getenv("CAREER_BOT_USER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+# кэш множеств избранного (user_id -> {(entity_type, entity_id)}), те же TTL и лимиты
+FAV_CACHE_SIZE = int(os.getenv("CAREER_BOT_FAV_CACHE_SIZE", "100000"))
+
+# профили хранилища: journal_mode пишется в файл БД (ставит соединение-писатель),
+# остальные PRAGMA действуют на соединение и ставятся каждому соединению пула
+STORAGE_PROFILES: Dict[str, Dict[str, object]] = {
+    # умолчания SQLite — для сравнения и отката
+    "legacy": {
+        "journal_mode": "delete",
+        "synchronous": 2,  # FULL
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": 0,  # DEFAULT
+        "busy_timeout": 5000,
+    },
+    # WAL: читатели не блокируют писателя; fsync только на checkpoint
+    "wal": {
+        "journal_mode": "wal",
+        "synchronous": 1,  # NORMAL
+        "cache_size": -16000,  # ~16 МБ
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": 2,  # MEMORY
+        "busy_timeout": 5000,
+    },
+    # WAL, но fsync на каждый commit
+    "wal_durable": {
+        "journal_mode": "wal",
+        "synchronous": 2,  # FULL
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": 2,
+        "busy_timeout": 5000,
+    },
+}
+DB_PROFILE = os.getenv("CAREER_BOT_DB_PROFILE", "wal")
+
+
+def _profile() -> Dict[str, object]:
+    try:
+        return STORAGE_PROFILES[DB_PROFILE]
+    except KeyError:
+        raise RuntimeError(
+            f"unknown CAREER_BOT_DB_PROFILE={DB_PROFILE!r}, "
+            f"expected one of {sorted(STORAGE_PROFILES)}"
+        ) from None
+
+
+def _register_functions(conn: sqlite3.Connection) -> None:
+    """SQL-функции, на которые опираются триггеры схемы; нужны каждому пишущему соединению."""
+    conn.create_function("price_tier", 1, price_tier, deterministic=True)
+
+
+def _apply_profile(conn: sqlite3.Connection) -> None:
+    for key, val in _profile().items():
+        if key != "journal_mode":
+            conn.execute(f"PRAGMA {key}={val}")
+
+
+def db_connect(path: Optional[str] = None, writer: bool = False):
+    conn = sqlite3.connect(
+        path or DB_PATH,
+        check_same_thread=False,
+        cached_statements=STMT_CACHE_SIZE,
+    )
+    if writer:
+        # journal_mode хранится в файле БД — ставит его писатель
+        conn.execute(f"PRAGMA journal_mode={_profile()['journal_mode']}")
+    _apply_profile(conn)
+    _register_functions(conn)
+    return conn
+
+
+def content_db_path() -> str:
+    return CONTENT_DB_PATH or DB_PATH
+
+
+def content_split() -> bool:
+    """Каталог лежит в отдельном от пользователей файле."""
+    return os.path.abspath(content_db_path()) != os.path.abspath(DB_PATH)
+
+
+def content_connect() -> sqlite3.Connection:
+    """Соединение только для чтения к отдельной БД контента."""
+    flags = "mode=ro&immutable=1" if CONTENT_IMMUTABLE else "mode=ro"
+    conn = sqlite3.connect(
+        f"{pathlib.Path(content_db_path()).resolve().as_uri()}?{flags}",
+        uri=True,
+        check_same_thread=False,
+        cached_statements=STMT_CACHE_SIZE,
+    )
+    _apply_profile(conn)
+    return conn
+
+
+# ---------- POOL ----------
+
+class _Pool:
+    """Пул соединений к одному файлу БД: стек читателей и единственный писатель."""
+
+    def __init__(self, path: str, size: int, idle_sec: float):
+        self.path = path
+        self.size = max(1, size)
+        self.idle_sec = idle_sec
+        self._idle: List[Tuple[sqlite3.Connection, float]] = []  # (conn, last_used)
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_used = 0.0
+        self._wlock = threading.Lock()
+        self._closed = False
+
+    def _expired(self, last_used: float, now: float) -> bool:
+        return self.idle_sec > 0 and now - last_used > self.idle_sec
+
+    def _acquire(self) -> sqlite3.Connection:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("db pool is closed")
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    return conn
+                if self._opened < self.size:
+                    self._opened += 1
+                    break
+                self._cond.wait()
+        try:
+            return db_connect(self.path)
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        now = time.monotonic()
+        stale: List[sqlite3.Connection] = []
+        with self._cond:
+            if self._closed:
+                stale.append(conn)
+            else:
+                # LIFO: горячие соединения сверху, давно простаивающие — закрываем
+                keep = []
+                for c, used in self._idle:
+                    if self._expired(used, now):
+                        stale.append(c)
+                    else:
+                        keep.append((c, used))
+                keep.append((conn, now))
+                self._idle = keep
+            self._opened -= len(stale)
+            self._cond.notify()
+        for c in stale:
+            c.close()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Соединение-писатель внутри транзакции (commit/rollback на выходе)."""
+        with self._wlock:
+            if self._closed:
+                raise RuntimeError("db pool is closed")
+            now = time.monotonic()
+            if self._writer is not None and self._expired(self._writer_used, now):
+                self._writer.close()
+                self._writer = None
+            if self._writer is None:
+                self._writer = db_connect(self.path, writer=True)
+            try:
+                with self._writer:
+                    yield self._writer
+            finally:
+                self._writer_used = time.monotonic()
+
+    def close(self) -> None:
+        with self._wlock, self._cond:
+            self._closed = True
+            for c, _ in self._idle:
+                c.close()
+            self._idle = []
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._cond.notify_all()
+
+
+# ---------- CACHE ----------
+
+class _LRUCache:
+    """
+    Потокобезопасный LRU-кэш с TTL и лимитами по числу записей и примерному
+    объёму. Писатели зовут update/invalidate после commit; читатель кладёт
+    значение только если с момента его чтения из БД ключ не менялся.
+    """
+
+    _ENTRY_OVERHEAD = 120  # узел OrderedDict + кортеж записи, байт
+    _STRIPES = 64
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: int):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Any, Tuple[Any, float, int]]" = OrderedDict()
+        self._gen = [0] * self._STRIPES
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _sizeof(value: Any) -> int:
+        size = sys.getsizeof(value)
+        if isinstance(value, tuple):
+            size += sum(sys.getsizeof(v) for v in value)
+        elif isinstance(value, frozenset):
+            size += sum(_LRUCache._sizeof(v) for v in value)
+        return size
+
+    def generation(self, key: Any) -> int:
+        return self._gen[hash(key) % self._STRIPES]
+
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return False, None
+            value, expires, size = item
+            if self.ttl > 0 and time.monotonic() > expires:
+                del self._data[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def _store(self, key: Any, value: Any, size: int) -> None:
+        # вызывается под self._lock
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= old[2]
+        self._data[key] = (value, time.monotonic() + self.ttl, size)
+        self.bytes += size
+        while self._data and (
+            len(self._data) > self.max_entries or self.bytes > self.max_bytes
+        ):
+            _, (_, _, dropped) = self._data.popitem(last=False)
+            self.bytes -= dropped
+            self.evictions += 1
+
+    def put(self, key: Any, value: Any, generation: Optional[int] = None) -> None:
+        size = self._sizeof(value) + self._ENTRY_OVERHEAD
+        with self._lock:
+            if generation is not None and generation != self.generation(key):
+                return  # ключ успели изменить, пока читали БД
+            self._store(key, value, size)
+
+    def update(self, key: Any, fn: Callable[[Any], Any]) -> None:
+        """
+        Применяет fn к закэшированному значению (если оно есть). Чтение, fn и
+        запись — под одной блокировкой: параллельные правки одного ключа
+        не теряют друг друга. fn должна быть быстрой и не трогать кэш.
+        """
+        with self._lock:
+            self._gen[hash(key) % self._STRIPES] += 1
+            item = self._data.get(key)
+            if item is not None:
+                value = fn(item[0])
+                self._store(key, value, self._sizeof(value) + self._ENTRY_OVERHEAD)
+
+    def touch(self, key: Any) -> None:
+        """Сдвигает поколение ключа: идущие сейчас чтения не попадут в кэш."""
+        with self._lock:
+            self._gen[hash(key) % self._STRIPES] += 1
+
+    def invalidate(self, key: Any) -> None:
+        with self._lock:
+            self._gen[hash(key) % self._STRIPES] += 1
+            item = self._data.pop(key, None)
+            if item is not None:
+                self.bytes -= item[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._gen = [g + 1 for g in self._gen]
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# user_id -> строка get_user (или None, если пользователя нет)
+_user_cache = _LRUCache(USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_MAX_BYTES)
+
+
+# user_id -> frozenset {(entity_type, entity_id)} избранного
+_fav_cache = _LRUCache(FAV_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_MAX_BYTES)
+
+
+def user_cache_stats() -> Dict[str, int]:
+    return _user_cache.stats()
+
+
+def fav_cache_stats() -> Dict[str, int]:
+    return _fav_cache.stats()
+
+
+_pool: Optional[_Pool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> _Pool:
+    """Пул для текущего DB_PATH (пересоздаётся, если путь поменяли)."""
+    global _pool
+    pool = _pool
+    if pool is None or pool.path != DB_PATH:
+        if pool is not None:
+            # очередь записей дописывается в старую базу, как в close_pool
+            _write_behind.drain()
+        with _pool_lock:
+            if _pool is None or _pool.path != DB_PATH:
+                if _pool is not None:
+                    _pool.close()
+                _user_cache.clear()
+                _fav_cache.clear()
+                _content_store.reset()
+                _pool = _Pool(DB_PATH, POOL_SIZE, POOL_IDLE_SEC)
+            pool = _pool
+    return pool
+
+
+def close_pool() -> None:
+    global _pool
+    _write_behind.drain()
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    _user_cache.clear()
+    _fav_cache.clear()
+    _content_store.reset()
+
+
+def _open_pool() -> _Pool:
+    """
+    Открытый пул, даже если DB_PATH уже поменяли: write-behind коммитит
+    в ту базу, для которой набрал очередь, и не ждёт смены пула.
+    """
+    return _pool or get_pool()
+
+
+def _read():
+    return get_pool().reader()
+
+
+def _write():
+    return get_pool().writer()
+
+
+@contextmanager
+def _content_write() -> Iterator[sqlite3.Connection]:
+    """Писатель БД контента: сид, патчи и миграции каталога."""
+    if not content_split():
+        with _write() as conn:
+            yield conn
+        return
+    conn = sqlite3.connect(content_db_path(), cached_statements=STMT_CACHE_SIZE)
+    _register_functions(conn)
+    try:
+        # immutable-читатели не видят WAL — контент держим в rollback-журнале
+        conn.execute("PRAGMA journal_mode=delete")
+        conn.execute(f"PRAGMA busy_timeout={_profile()['busy_timeout']}")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+# ---------- WRITE-BEHIND ----------
+
+class _WriteBehind:
+    """
+    Очередь отложенных записей. Изменения копятся по ключу (kind, key) и
+    сливаются (merge), фоновый поток пишет их пачкой в одной транзакции.
+    Пока запись не закоммичена, она видна через pending() — get_user
+    накладывает её на строку из БД.
+    """
+
+    _LATENCY_WINDOW = 1000
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self._inflight: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self._first_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.submitted = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.failures = 0
+        self._latencies: List[float] = []
+
+    # --- приём ---
+
+    def submit(self, kind: str, key: Any, payload: Dict[str, Any]) -> None:
+        merge = _WRITE_KINDS[kind][0]
+        if DURABILITY == "immediate":
+            with self._flush_lock:
+                self.submitted += 1
+                self._commit({(kind, key): payload})
+            return
+        with self._cond:
+            self.submitted += 1
+            cur = self._pending.get((kind, key))
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending[(kind, key)] = merge(cur, payload) if cur else payload
+            # поток мог выйти сразу, если submit пришёлся на drain
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="db-write-behind", daemon=True
+                )
+                self._thread.start()
+            if len(self._pending) >= WRITE_BATCH_SIZE:
+                self._cond.notify_all()
+
+    def pending(self, kind: str, key: Any) -> Optional[Dict[str, Any]]:
+        """Незакоммиченные изменения ключа (inflight + очередь), слитые вместе."""
+        with self._cond:
+            a = self._inflight.get((kind, key))
+            b = self._pending.get((kind, key))
+        if a and b:
+            return _WRITE_KINDS[kind][0](a, b)
+        return a or b
+
+    # --- запись ---
+
+    def _commit(self, batch: Dict[Tuple[str, Any], Dict[str, Any]]) -> None:
+        t0 = time.perf_counter()
+        by_kind: Dict[str, List[Tuple[Any, Dict[str, Any]]]] = {}
+        for (kind, key), payload in batch.items():
+            by_kind.setdefault(kind, []).append((key, payload))
+        with _open_pool().writer() as conn:
+            for kind, items in by_kind.items():
+                _WRITE_KINDS[kind][1](conn, items)
+        for kind, items in by_kind.items():
+            after = _WRITE_KINDS[kind][2]
+            if after is not None:
+                for key, _ in items:
+                    after(key)
+        self.flushes += 1
+        self.flushed += len(batch)
+        self._latencies.append(time.perf_counter() - t0)
+        if len(self._latencies) > self._LATENCY_WINDOW:
+            del self._latencies[: -self._LATENCY_WINDOW]
+
+    def flush(self) -> int:
+        """Синхронно пишет всё, что накопилось; возвращает число ключей."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return 0
+            try:
+                self._commit(batch)
+            except Exception:
+                with self._cond:
+                    # возвращаем в очередь, более свежие изменения — поверх
+                    for (kind, key), payload in batch.items():
+                        newer = self._pending.get((kind, key))
+                        self._pending[(kind, key)] = (
+                            _WRITE_KINDS[kind][0](payload, newer) if newer else payload
+                        )
+                    self._inflight = {}
+                self.failures += 1
+                raise
+            with self._cond:
+                self._inflight = {}
+            return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                deadline = self._first_at + WRITE_FLUSH_SEC
+                while len(self._pending) < WRITE_BATCH_SIZE and not self._stopping:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+            try:
+                self.flush()
+            except Exception:
+                logging.getLogger(__name__).exception("write-behind flush failed")
+                time.sleep(WRITE_FLUSH_SEC)
+
+    def drain(self) -> None:
+        """Останавливает фоновый поток и дописывает очередь до конца."""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            self._stopping = False
+        while self.flush():
+            pass
+
+    def stats(self) -> Dict[str, float]:
+        lat = sorted(self._latencies)
+        with self._cond:
+            pending = len(self._pending) + len(self._inflight)
+
+        def pct(q: float) -> float:
+            return lat[min(len(lat) - 1, int(q * len(lat)))] * 1000 if lat else 0.0
 
-def db_connect():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+        return {
+            "mode": DURABILITY,
+            "pending": pending,
+            "submitted": self.submitted,
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "coalesced": self.submitted - self.flushed - pending,
+            "failures": self.failures,
+            "flush_ms_p50": pct(0.5),
+            "flush_ms_p99": pct(0.99),
+            "flush_ms_max": lat[-1] * 1000 if lat else 0.0,
+        }
 
 
-def _has_col(cur, table: str, col: str) -> bool:
-    cur.execute(f"PRAGMA table_info({table})")
-    return col in [r[1] for r in cur.fetchall()]
+def _merge_user(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(old)
+    merged.update(new)
+    if "_insert" in old and "_insert" in new:
+        # age_group при вставке — из первого add_user, имя — последнее
+        merged["_insert"] = (new["_insert"][0], old["_insert"][1])
+    return merged
 
 
-def init_db() -> None:
-    """Создание/миграции схемы (идемпотентно)."""
-    with closing(db_connect()) as conn, conn:
-        cur = conn.cursor()
-
-        # users
-        cur.execute(
+def _flush_users(conn: sqlite3.Connection, items: List[Tuple[int, Dict[str, Any]]]) -> None:
+    inserts = [(uid, *p["_insert"]) for uid, p in items if "_insert" in p]
+    if inserts:
+        conn.executemany(
             """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE,
-            name TEXT,
-            age_group TEXT,
-            interest TEXT,
-            test_scores TEXT,
-            lang TEXT
-        )"""
+            INSERT INTO users (user_id, name, age_group)
+            VALUES (?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET name=excluded.name
+        """,
+            inserts,
         )
+    # одинаковые наборы колонок — одним executemany
+    updates: Dict[Tuple[str, ...], List[Tuple]] = {}
+    for uid, p in items:
+        cols = tuple(sorted(k for k in p if k != "_insert"))
+        if cols:
+            updates.setdefault(cols, []).append(tuple(p[c] for c in cols) + (uid,))
+    for cols, rows in updates.items():
+        assignments = ", ".join(f"{c}=?" for c in cols)
+        conn.executemany(f"UPDATE users SET {assignments} WHERE user_id=?", rows)
 
-        # professions
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS professions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            category TEXT,
-            name TEXT,
-            description TEXT,
-            skills TEXT,
-            link TEXT,
-            domain TEXT,
-            name_en TEXT,
-            description_en TEXT,
-            skills_en TEXT
-        )"""
-        )
 
-        # tips
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS tips (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            text TEXT
-        )"""
-        )
+# kind -> (merge, flush(conn, items), after_commit(key) | None)
+_WRITE_KINDS: Dict[str, Tuple[Callable, Callable, Optional[Callable]]] = {
+    "user": (_merge_user, _flush_users, _user_cache.touch),
+}
 
-        # courses
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            category TEXT,
-            link TEXT,
-            level TEXT,
-            title_en TEXT
-        )"""
-        )
+_write_behind = _WriteBehind()
 
-        # favorites
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS favorites (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            entity_type TEXT,
-            entity_id INTEGER,
-            UNIQUE (user_id, entity_type, entity_id)
-        )"""
-        )
 
-        # questions
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_idx INTEGER,
-            text TEXT
-        )"""
-        )
+def flush_writes() -> int:
+    return _write_behind.flush()
 
-        # answers
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS answers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            question_id INTEGER,
-            text TEXT,
-            weight_creative INTEGER DEFAULT 0,
-            weight_tech INTEGER DEFAULT 0,
-            weight_social INTEGER DEFAULT 0,
-            weight_business INTEGER DEFAULT 0,
-            weight_green INTEGER DEFAULT 0
-        )"""
-        )
 
-        # --- миграции (добавляем недостающие колонки) ---
-        for tbl, col in [
-            ("users", "test_scores"),
-            ("users", "lang"),
-            ("professions", "skills"),
-            ("professions", "link"),
-            ("professions", "domain"),
-            ("professions", "name_en"),
-            ("professions", "description_en"),
-            ("professions", "skills_en"),
-            ("courses", "level"),
-            ("courses", "title_en"),
-            ("questions", "text_en"),
-            ("questions", "text_az"),
-            ("answers", "text_en"),
-            ("answers", "text_az"),
-            ("tips", "text_en"),
-            ("tips", "text_az"),
-        ]:
-            if not _has_col(cur, tbl, col):
-                cur.execute(f"ALTER TABLE {tbl} ADD COLUMN {col} TEXT")
-
-
-def seed_data() -> None:
-    """Начальные данные + переводы, если пусто."""
-    with closing(db_connect()) as conn, conn:
-        cur = conn.cursor()
+def write_stats() -> Dict[str, float]:
+    return _write_behind.stats()
 
-        # Профессии (если пусто)
-        cur.execute("SELECT COUNT(*) FROM professions")
-        if cur.fetchone()[0] == 0:
-            profs = [
-                (
-                    "tech",
-                    "Python-разработчик",
-                    "Пишет ботов и веб-сервисы на Python.",
-                    "Python, SQL, Git, API",
-                    "https://stepik.org/",
-                    "backend",
-                    "Python Developer",
-                    "Builds bots & web services with Python.",
-                    "Python, SQL, Git, API",
-                ),
-                (
-                    "tech",
-                    "Data Analyst / BI",
-                    "Аналитика данных и дашборды.",
-                    "SQL, Python, BI",
-                    "https://stepik.org/",
-                    "data",
-                    "Data Analyst / BI",
-                    "Data analysis and dashboards.",
-                    "SQL, Python, BI",
-                ),
-                (
-                    "tech",
-                    "ML Engineer",
-                    "Модели, обучение, MLOps.",
-                    "Python, PyTorch, MLOps",
-                    "https://www.coursera.org/",
-                    "ai_ml",
-                    "ML Engineer",
-                    "Models, training, MLOps.",
-                    "Python, PyTorch, MLOps",
-                ),
-                (
-                    "tech",
-                    "QA Automation",
-                    "Автотесты и CI/CD.",
-                    "PyTest, Selenium, CI/CD",
-                    "https://docs.pytest.org/",
-                    "qa",
-                    "QA Automation",
-                    "Test automation & CI/CD.",
-                    "PyTest, Selenium, CI/CD",
-                ),
-                (
-                    "tech",
-                    "Cybersecurity Analyst",
-                    "Инциденты и уязвимости.",
-                    "Network, SIEM, Security",
-                    "https://www.coursera.org/",
-                    "cyber",
-                    "Cybersecurity Analyst",
-                    "Incidents and vulnerabilities.",
-                    "Network, SIEM, Security",
-                ),
-                (
-                    "creative",
-                    "UX/UI Designer",
-                    "Проектирует сценарии и интерфейсы.",
-                    "Figma, Research, Prototyping",
-                    "https://www.figma.com/",
-                    "ux_ui",
-                    "UX/UI Designer",
-                    "Designs flows & interfaces.",
-                    "Figma, Research, Prototyping",
-                ),
-                (
-                    "business",
-                    "Product Manager",
-                    "Гипотезы, метрики, рост.",
-                    "Analytics, CJM, A/B",
-                    "https://www.coursera.org/",
-                    "pm_ba",
-                    "Product Manager",
-                    "Hypotheses, metrics, growth.",
-                    "Analytics, CJM, A/B",
-                ),
-                (
-                    "business",
-                    "Business Analyst",
-                    "Требования, диаграммы, SQL.",
-                    "BPMN, BRD, SQL",
-                    "https://www.coursera.org/",
-                    "pm_ba",
-                    "Business Analyst",
-                    "Requirements, diagrams, SQL.",
-                    "BPMN, BRD, SQL",
-                ),
-                (
-                    "social",
-                    "Customer Success Manager",
-                    "Онбординг, удержание, NPS.",
-                    "Onboarding, CRM, Empathy",
-                    "https://successhub.com/",
-                    "",
-                    "Customer Success Manager",
-                    "Onboarding, retention, NPS.",
-                    "Onboarding, CRM, Empathy",
-                ),
-                (
-                    "green",
-                    "Sustainability Specialist",
-                    "ESG-инициативы и отчётность.",
-                    "ESG, Reporting, Analytics",
-                    "https://www.coursera.org/",
-                    "",
-                    "Sustainability Specialist",
-                    "ESG initiatives & reporting.",
-                    "ESG, Reporting, Analytics",
-                ),
-            ]
-            cur.executemany(
-                """
-                INSERT INTO professions
-                (category, name, description, skills, link, domain, name_en, description_en, skills_en)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                profs,
-            )
 
-        # Советы
-        cur.execute("SELECT COUNT(*) FROM tips")
-        if cur.fetchone()[0] == 0:
-            tips = [
-                (
-                    "Начни с малого: 20 минут в день, но ежедневно.",
-                    "Start small: 20 minutes a day, but every day.",
-                    "Kiçik başla: günə 20 dəqiqə, amma hər gün.",
-                ),
-                (
-                    "Не сравнивай свой старт с чужой серединой.",
-                    "Don’t compare your start to someone else’s middle.",
-                    "Başlanğıcını başqasının ortası ilə müqayisə etmə.",
-                ),
-                (
-                    "Контроль — в привычках. Навык — в практике.",
-                    "Control lives in habits. Skill lives in practice.",
-                    "Nəzarət vərdişlərdədir. Bacarıq təcrübədədir.",
-                ),
-                (
-                    "Вопросы важнее ответов — будь любопытным.",
-                    "Questions are more important than answers — stay curious.",
-                    "Sual cavabdan daha vacibdir — maraqlı ol.",
-                ),
-            ]
-            cur.executemany(
-                "INSERT INTO tips (text, text_en, text_az) VALUES (?, ?, ?)", tips
-            )
+def _has_col(cur, table: str, col: str) -> bool:
+    cur.execute(f"PRAGMA table_info({table})")
+    return col in [r[1] for r in cur.fetchall()]
 
-        # Курсы (free)
-        cur.execute("SELECT COUNT(*) FROM courses")
-        if cur.fetchone()[0] == 0:
-            courses = [
-                (
-                    "freeCodeCamp: Python",
-                    "tech",
-                    "https://www.freecodecamp.org/learn/scientific-computing-with-python/",
-                    "free",
-                    "freeCodeCamp: Python",
-                ),
-                (
-                    "CS50x (Harvard) — вводный курс CS",
-                    "tech",
-                    "https://cs50.harvard.edu/x/",
-                    "free",
-                    "CS50x — Intro CS",
-                ),
-                (
-                    "Kaggle Microcourses — практическая аналитика данных",
-                    "tech",
-                    "https://www.kaggle.com/learn",
-                    "free",
-                    "Kaggle Microcourses",
-                ),
-                (
-                    "Intro to SQL (Mode) — основы SQL",
-                    "tech",
-                    "https://mode.com/sql-tutorial/",
-                    "free",
-                    "Intro to SQL",
-                ),
-                (
-                    "PyTest Docs (официальная документация)",
-                    "tech",
-                    "https://docs.pytest.org/",
-                    "free",
-                    "PyTest Docs",
-                ),
-                (
-                    "Figma Learn — основы дизайна интерфейсов",
-                    "creative",
-                    "https://help.figma.com/hc/en-us/articles/360040528973-Learn-design-with-Figma",
-                    "free",
-                    "Figma Learn",
-                ),
-                (
-                    "Google UX Basics (Coursera, аудит)",
-                    "creative",
-                    "https://www.coursera.org/professional-certificates/google-ux-design",
-                    "free",
-                    "Google UX Basics",
-                ),
-                (
-                    "Product School Blog — продуктовый менеджмент",
-                    "business",
-                    "https://productschool.com/blog",
-                    "free",
-                    "Product School Blog",
-                ),
-                (
-                    "PMBOK Overview (free) — основы проектного управления",
-                    "business",
-                    "https://www.pmi.org/pmbok-guide-standards",
-                    "free",
-                    "PMBOK Overview",
-                ),
-                (
-                    "Customer Success Fundamentals",
-                    "social",
-                    "https://successhub.com/",
-                    "free",
-                    "Customer Success Fundamentals",
-                ),
-                (
-                    "ESG Basics (UN) — устойчивое развитие",
-                    "green",
-                    "https://sdgs.un.org/",
-                    "free",
-                    "ESG Basics (UN)",
-                ),
-            ]
-            cur.executemany(
-                """
-                INSERT INTO courses (title, category, link, level, title_en)
-                VALUES (?, ?, ?, ?, ?)
-            """,
-                courses,
-            )
 
-        # Вопросы/ответы теста с переводами
-        cur.execute("SELECT COUNT(*) FROM questions")
-        if cur.fetchone()[0] == 0:
-            questions = [
-                (
-                    0,
-                    "Что тебе интереснее всего делать в проекте?",
-                    "What is most interesting for you in a project?",
-                    "Layihədə ən çox nə maraqlıdır?",
-                ),
-                (
-                    1,
-                    "Какой тип задач тебя заряжает?",
-                    "What type of tasks energize you?",
-                    "Səni hansı tapşırıqlar ruhlandırır?",
-                ),
-                (
-                    2,
-                    "Что проще начать сегодня?",
-                    "What is easier to start today?",
-                    "Bu gün nədən başlamaq asandır?",
-                ),
-                (
-                    3,
-                    "Какой формат команды комфортнее?",
-                    "What team format is more comfortable?",
-                    "Hansı komanda formatı rahatdır?",
-                ),
-                (
-                    4,
-                    "Что для тебя успех через 6 месяцев?",
-                    "What is a success for you in 6 months?",
-                    "6 ay sonra uğur sənin üçün nə deməkdir?",
-                ),
-                (
-                    5,
-                    "Какая среда/инструмент ближе?",
-                    "Which environment/tool is closer to you?",
-                    "Hansə mühit/alət sənə yaxındır?",
-                ),
-                (
-                    6,
-                    "Что легче давалось в школе/вузе?",
-                    "What was easier for you at school/university?",
-                    "Məktəbdə/universitetdə nə daha asan idi?",
-                ),
-                (
-                    7,
-                    "Как относишься к экспериментам и риску?",
-                    "How do you feel about experiments and risk?",
-                    "Eksperiment və riskə münasibətin necədir?",
-                ),
-                (
-                    8,
-                    "Что важнее: влияние или глубина экспертизы?",
-                    "What is more important: impact or depth of expertise?",
-                    "Daha vacib nədir: təsir yoxsa ekspertiza dərinliyi?",
-                ),
-                (
-                    9,
-                    "С чем точно не хочется работать?",
-                    "What do you definitely not want to work with?",
-                    "Nə ilə işləmək istəmirsən?",
-                ),
-            ]
-            cur.executemany(
-                """
-                INSERT INTO questions (order_idx, text, text_en, text_az)
-                VALUES (?, ?, ?, ?)
-            """,
-                questions,
-            )
+# категории теста; порядок — колонки весов answers и баллов test_results
+CATEGORIES = ("creative", "tech", "social", "business", "green")
+
+# языки, для которых слепок держит готовые списки советов
+CONTENT_LANGS = ("ru", "en", "az")
+DEFAULT_TIP = "Делай маленькие шаги каждый день."
+
+# таблицы, которые меняются только пересидом/патч-скриптами
+CONTENT_TABLES = ("professions", "courses", "tips", "questions", "answers")
+
+# courses.price_tier — ключ фильтра; level остаётся подписью для показа
+PRICE_FREE = "free"
+PRICE_PAID = "paid"
+FREE_LEVELS = {"бесплатно", "free"}
+
+
+def price_tier(level: Optional[str]) -> str:
+    return PRICE_FREE if (level or "").strip().lower() in FREE_LEVELS else PRICE_PAID
+
+
+# индекс по (col) хранит rowid, поэтому WHERE col=? ORDER BY id идёт без сортировки
+INDEXES = [
+    # prof_by_cat / prof_by_domain: WHERE ...=? ORDER BY name
+    "CREATE INDEX IF NOT EXISTS idx_professions_category_name ON professions(category, name)",
+    "CREATE INDEX IF NOT EXISTS idx_professions_domain_name ON professions(domain, name)",
+    # courses_by_cat: WHERE category=?; free_courses_by_cat:
+    # WHERE category=? AND price_tier='free' ORDER BY id LIMIT ? — без сортировки
+    "DROP INDEX IF EXISTS idx_courses_category",
+    "CREATE INDEX IF NOT EXISTS idx_courses_category_tier ON courses(category, price_tier)",
+    # get_question_by_index: WHERE order_idx=?
+    "CREATE INDEX IF NOT EXISTS idx_questions_order_idx ON questions(order_idx)",
+    # get_answers_for_question: WHERE question_id=? ORDER BY id
+    "CREATE INDEX IF NOT EXISTS idx_answers_question ON answers(question_id)",
+    # users.user_id и избранное уже покрыты UNIQUE-индексами; для джойнов
+    # избранного UNIQUE (user_id, entity_type, entity_id) работает как покрывающий
+]
+
+
+def check_storage_profile() -> Dict[str, object]:
+    """Сверяет фактические PRAGMA с выбранным профилем; RuntimeError при расхождении."""
+    expected = _profile()
+    actual: Dict[str, object] = {}
+    with _read() as conn:
+        for key in expected:
+            actual[key] = conn.execute(f"PRAGMA {key}").fetchone()[0]
+    bad = []
+    for key, want in expected.items():
+        got = actual[key]
+        if key == "journal_mode":
+            ok = str(got).lower() == want
+        elif key == "mmap_size":
+            # сборка SQLite может ограничивать mmap (SQLITE_MAX_MMAP_SIZE)
+            ok = 0 <= int(got) <= int(want)
+        else:
+            ok = got == want
+        if not ok:
+            bad.append(f"{key}={got!r} (expected {want!r})")
+    if bad:
+        raise RuntimeError(
+            f"storage profile {DB_PROFILE!r} not applied: " + ", ".join(bad)
+        )
+    return actual
+
+
+def _m_user_tables(cur: sqlite3.Cursor) -> None:
+    """Пользователи и избранное (до реестра миграций)."""
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER UNIQUE,
+        name TEXT,
+        age_group TEXT,
+        interest TEXT,
+        test_scores TEXT,
+        lang TEXT
+    )"""
+    )
+
+    # favorites.entity_id — id из professions/courses БД контента
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS favorites (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        entity_type TEXT,
+        entity_id INTEGER,
+        UNIQUE (user_id, entity_type, entity_id)
+    )"""
+    )
+
+    # старые базы: добавляем недостающие колонки
+    for col in ("test_scores", "lang"):
+        if not _has_col(cur, "users", col):
+            cur.execute(f"ALTER TABLE users ADD COLUMN {col} TEXT")
+
+
+def _m_content_tables(cur: sqlite3.Cursor) -> None:
+    """Каталог и тест (до реестра миграций)."""
+    # professions
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS professions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category TEXT,
+        name TEXT,
+        description TEXT,
+        skills TEXT,
+        link TEXT,
+        domain TEXT,
+        name_en TEXT,
+        description_en TEXT,
+        skills_en TEXT
+    )"""
+    )
+
+    # tips
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS tips (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT
+    )"""
+    )
+
+    # courses
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT,
+        category TEXT,
+        link TEXT,
+        level TEXT,
+        title_en TEXT
+    )"""
+    )
+
+    # questions
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_idx INTEGER,
+        text TEXT
+    )"""
+    )
+
+    # answers
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS answers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        question_id INTEGER,
+        text TEXT,
+        weight_creative INTEGER DEFAULT 0,
+        weight_tech INTEGER DEFAULT 0,
+        weight_social INTEGER DEFAULT 0,
+        weight_business INTEGER DEFAULT 0,
+        weight_green INTEGER DEFAULT 0
+    )"""
+    )
+
+    # старые базы: добавляем недостающие колонки
+    for tbl, col in [
+        ("professions", "skills"),
+        ("professions", "link"),
+        ("professions", "domain"),
+        ("professions", "name_en"),
+        ("professions", "description_en"),
+        ("professions", "skills_en"),
+        ("courses", "level"),
+        ("courses", "title_en"),
+        ("questions", "text_en"),
+        ("questions", "text_az"),
+        ("answers", "text_en"),
+        ("answers", "text_az"),
+        ("tips", "text_en"),
+        ("tips", "text_az"),
+    ]:
+        if not _has_col(cur, tbl, col):
+            cur.execute(f"ALTER TABLE {tbl} ADD COLUMN {col} TEXT")
+
+
+def _m_price_tier(cur: sqlite3.Cursor) -> None:
+    """courses.price_tier — нормализованная цена из level."""
+    if not _has_col(cur, "courses", "price_tier"):
+        cur.execute("ALTER TABLE courses ADD COLUMN price_tier TEXT")
+    rows = cur.execute("SELECT id, level FROM courses WHERE price_tier IS NULL").fetchall()
+    cur.executemany(
+        "UPDATE courses SET price_tier=? WHERE id=?",
+        [(price_tier(level), cid) for cid, level in rows],
+    )
+    # для строк, вставленных мимо DAO; LOWER() в SQLite знает только ASCII
+    free_variants = sorted(
+        {f(v) for v in FREE_LEVELS for f in (str.lower, str.capitalize, str.upper)}
+    )
+    cur.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_courses_price_tier
+    AFTER INSERT ON courses WHEN NEW.price_tier IS NULL
+    BEGIN
+        UPDATE courses SET price_tier = CASE
+            WHEN LOWER(TRIM(NEW.level)) IN ({", ".join(f"'{v}'" for v in free_variants)})
+            THEN '{PRICE_FREE}' ELSE '{PRICE_PAID}' END
+        WHERE id = NEW.id;
+    END"""
+    )
+
+
+def _price_tier_sql(level: str) -> str:
+    """price_tier() на SQL; LOWER() в SQLite знает только ASCII — перечисляем регистры."""
+    free_variants = sorted(
+        {f(v) for v in FREE_LEVELS for f in (str.lower, str.capitalize, str.upper)}
+    )
+    free = ", ".join(f"'{v}'" for v in free_variants)
+    return (
+        f"CASE WHEN LOWER(TRIM({level})) IN ({free}) "
+        f"THEN '{PRICE_FREE}' ELSE '{PRICE_PAID}' END"
+    )
+
+
+def _m_price_tier_sync(cur: sqlite3.Cursor) -> None:
+    """
+    price_tier следует за level и при UPDATE мимо DAO (патчи, ручные правки);
+    уже разошедшиеся строки пересчитываются.
+    """
+    cur.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS trg_courses_price_tier_level
+    AFTER UPDATE OF level ON courses
+    BEGIN
+        UPDATE courses SET price_tier = {_price_tier_sql("NEW.level")} WHERE id = NEW.id;
+    END"""
+    )
+    rows = cur.execute("SELECT id, level, price_tier FROM courses").fetchall()
+    cur.executemany(
+        "UPDATE courses SET price_tier=? WHERE id=?",
+        [(price_tier(level), cid) for cid, level, tier in rows if tier != price_tier(level)],
+    )
+
+
+def _m_answer_positions(cur: sqlite3.Cursor) -> None:
+    """
+    answers.position — номер ответа внутри вопроса; натуральный ключ ответа
+    (question_id, position) вместо текста: правка текста в сиде обновляет
+    ответ на месте, id и ссылки на него в результатах сохраняются.
+    """
+    if not _has_col(cur, "answers", "position"):
+        cur.execute("ALTER TABLE answers ADD COLUMN position INTEGER")
+    rows = cur.execute("SELECT id, question_id FROM answers ORDER BY question_id, id").fetchall()
+    positions: Dict[Any, int] = {}
+    updates = []
+    for aid, qid in rows:
+        pos = positions.get(qid, 0)
+        positions[qid] = pos + 1
+        updates.append((pos, aid))
+    cur.executemany("UPDATE answers SET position=? WHERE id=?", updates)
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_answers_question_position "
+        "ON answers(question_id, position)"
+    )
+    cur.execute("DROP INDEX IF EXISTS ux_answers_question_text")
+
+
+def _m_drop_lookup_indexes(cur: sqlite3.Cursor) -> None:
+    """
+    Индексы горячих выборок каталога (миграция 3) больше ничего не обслуживают:
+    выборки идут из слепка контента, а он читает таблицы целиком. Индексы
+    натуральных ключей (ux_*) остаются — на них upsert сида.
+    """
+    cur.execute("DROP INDEX IF EXISTS idx_professions_domain_name")
+    cur.execute("DROP INDEX IF EXISTS idx_courses_category_tier")
+
+
+def _m_price_tier_function(cur: sqlite3.Cursor) -> None:
+    """
+    Триггеры price_tier — на SQL-функции price_tier() (_register_functions):
+    одна реализация с Python, без списка регистров. Вставка и правка ведут
+    себя одинаково: price_tier всегда выводится из level, явное значение
+    перезаписывается.
+    """
+    cur.execute("DROP TRIGGER IF EXISTS trg_courses_price_tier")
+    cur.execute("DROP TRIGGER IF EXISTS trg_courses_price_tier_level")
+    for name, event in (
+        ("trg_courses_price_tier", "INSERT"),
+        ("trg_courses_price_tier_level", "UPDATE OF level, price_tier"),
+    ):
+        cur.execute(
+            f"""
+    CREATE TRIGGER {name}
+    AFTER {event} ON courses WHEN NEW.price_tier IS NOT price_tier(NEW.level)
+    BEGIN
+        UPDATE courses SET price_tier = price_tier(NEW.level) WHERE id = NEW.id;
+    END"""
+        )
+    cur.execute(
+        "UPDATE courses SET price_tier = price_tier(level) "
+        "WHERE price_tier IS NOT price_tier(level)"
+    )
 
-            def add_ans(
-                order_idx,
-                text,
-                text_en,
-                text_az,
-                c=0,
-                t=0,
-                s=0,
-                b=0,
-                g=0,
-            ):
-                cur.execute(
-                    "SELECT id FROM questions WHERE order_idx=?", (order_idx,)
-                )
-                qid = cur.fetchone()[0]
-                cur.execute(
-                    """
-                    INSERT INTO answers
-                    (question_id, text, text_en, text_az,
-                     weight_creative, weight_tech, weight_social, weight_business, weight_green)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (qid, text, text_en, text_az, c, t, s, b, g),
-                )
 
-            add_ans(
-                0,
-                "Создавать визуально убедительное",
-                "Create visual concepts",
-                "Vizual konseptlər yaratmaq",
-                2,
-                0,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                0,
-                "Решать логические/тех. задачи",
-                "Solve logical/tech tasks",
-                "Məntiqi/texniki tapşırıqları həll etmək",
-                0,
-                2,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                0,
-                "Помогать людям и общаться",
-                "Help people and communicate",
-                "İnsanlara kömək və ünsiyyət",
-                0,
-                0,
-                2,
-                0,
-                0,
-            )
-            add_ans(
-                0,
-                "Организовывать и влиять",
-                "Organize and influence",
-                "Təşkil etmək və təsir göstərmək",
-                0,
-                0,
-                0,
-                2,
-                0,
-            )
+def _m_indexes(cur: sqlite3.Cursor) -> None:
+    for ddl in INDEXES:
+        cur.execute(ddl)
 
-            add_ans(
-                1,
-                "Дизайн-процесс и история",
-                "Design process & storytelling",
-                "Dizayn prosesi və hekayəçilik",
-                2,
-                0,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                1,
-                "Код/данные/автоматизация",
-                "Code/data/automation",
-                "Kod/məlumat/avtomatlaşdırma",
-                0,
-                2,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                1,
-                "Коммуникации/поддержка",
-                "Comms/support",
-                "Kommunikasiya/dəstək",
-                0,
-                0,
-                2,
-                0,
-                0,
-            )
-            add_ans(
-                1,
-                "Метрики/рост/управление",
-                "Metrics/growth/management",
-                "Metriklər/artım/idarəetmə",
-                0,
-                0,
-                0,
-                2,
-                0,
-            )
 
-            add_ans(
-                2,
-                "Сделать обложку/ролик",
-                "Make a cover/video",
-                "Obloşka/rolik hazırlamaq",
-                2,
-                0,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                2,
-                "Написать бота/скрипт",
-                "Write a bot/script",
-                "Bot/skipt yazmaq",
-                0,
-                2,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                2,
-                "Помочь/разобрать кейс",
-                "Help/analyze a case",
-                "Kömək/keisi təhlil etmək",
-                0,
-                0,
-                2,
-                0,
-                0,
-            )
-            add_ans(
-                2,
-                "Составить план и дедлайны",
-                "Plan & deadlines",
-                "Plan və deadline tərtib etmək",
-                0,
-                0,
-                0,
-                2,
-                0,
-            )
+def _m_tip_weight(cur: sqlite3.Cursor) -> None:
+    """tips.weight для взвешенного выбора совета (NULL = 1)."""
+    if not _has_col(cur, "tips", "weight"):
+        cur.execute("ALTER TABLE tips ADD COLUMN weight REAL")
 
-            add_ans(
-                3,
-                "Малая креативная команда",
-                "Small creative team",
-                "Kiçik kreativ komanda",
-                2,
-                0,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                3,
-                "Инженерная команда",
-                "Engineering team",
-                "Mühəndislik komanda",
-                0,
-                2,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                3,
-                "Поддержка/сообщество",
-                "Support/community",
-                "Dəstək/icma",
-                0,
-                0,
-                2,
-                0,
-                0,
-            )
-            add_ans(
-                3,
-                "Кросс-функциональная",
-                "Cross-functional",
-                "Çoxfunksiyalı",
-                0,
-                0,
-                0,
-                2,
-                0,
-            )
 
-            add_ans(
-                4,
-                "Портфолио из 3 работ",
-                "Portfolio of 3 works",
-                "3 işdən ibarət portfel",
-                2,
-                0,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                4,
-                "Автопайплайн/скрипты",
-                "Auto-pipelines/scripts",
-                "Auto-pipeline/skriptlər",
-                0,
-                2,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                4,
-                "Высокие оценки людей",
-                "Great feedback from people",
-                "İnsanlardan yüksək rəy",
-                0,
-                0,
-                2,
-                0,
-                0,
-            )
-            add_ans(
-                4,
-                "Рост метрик проекта",
-                "Project metrics growth",
-                "Layihə metriklərinin artması",
-                0,
-                0,
-                0,
-                2,
-                0,
+def _m_content_version(cur: sqlite3.Cursor) -> None:
+    """meta.content_version: любое изменение каталога/теста её увеличивает."""
+    cur.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+    cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('content_version', 0)")
+    for tbl in CONTENT_TABLES:
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(
+                f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tbl}_{op.lower()}_version
+            AFTER {op} ON {tbl}
+            BEGIN
+                UPDATE meta SET value = value + 1 WHERE key = 'content_version';
+            END"""
             )
 
-            add_ans(
-                5,
-                "Figma/монтаж/презентации",
-                "Figma/editing/presentations",
-                "Figma/montaj/prezentasiyalar",
-                2,
-                0,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                5,
-                "Python/SQL/IDE",
-                "Python/SQL/IDE",
-                "Python/SQL/IDE",
-                0,
-                2,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                5,
-                "CRM/чат/звонки",
-                "CRM/chat/calls",
-                "CRM/söhbət/zənglər",
-                0,
-                0,
-                2,
-                0,
-                0,
-            )
-            add_ans(
-                5,
-                "Kanban/метрики",
-                "Kanban/metrics",
-                "Kanban/metriklər",
-                0,
-                0,
-                0,
-                2,
-                0,
-            )
 
-            add_ans(
-                6,
-                "Искусство/литература",
-                "Arts/literature",
-                "İncəsənət/ədəbiyyat",
-                2,
-                0,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                6,
-                "Математика/информатика",
-                "Math/CS",
-                "Riyaziyyat/İT",
-                0,
-                2,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                6,
-                "Обществознание/психология",
-                "Social science/psychology",
-                "Cəmiyyət/psixologiya",
-                0,
-                0,
-                2,
-                0,
-                0,
-            )
-            add_ans(
-                6,
-                "Экономика/менеджмент",
-                "Economics/management",
-                "İqtisadiyyat/menecment",
-                0,
-                0,
-                0,
-                2,
-                0,
+# натуральные ключи для upsert сида: таблица -> (колонки, индекс, заменяемый индекс)
+NATURAL_KEYS = [
+    ("professions", ("category", "name"), "ux_professions_category_name",
+     "idx_professions_category_name"),
+    ("tips", ("text",), "ux_tips_text", None),
+    ("courses", ("category", "title"), "ux_courses_category_title", None),
+    ("questions", ("order_idx",), "ux_questions_order_idx", "idx_questions_order_idx"),
+    ("answers", ("question_id", "text"), "ux_answers_question_text", "idx_answers_question"),
+]
+
+
+def _m_natural_keys(cur: sqlite3.Cursor) -> None:
+    """
+    UNIQUE по натуральным ключам; дубли (двойной сид) схлопываем в младший id.
+    Строки с NULL в ключе дублями не считаются (UNIQUE их пропускает). Ссылки
+    на удалённые ответы в сохранённых результатах и сессиях переводятся на
+    оставшийся id.
+    """
+    for table, cols, name, replaces in NATURAL_KEYS:
+        key = ", ".join(cols)
+        filled = " AND ".join(f"{c} IS NOT NULL" for c in cols)
+        dups = cur.execute(
+            f"""
+            SELECT t.id, k.keep FROM {table} t
+            JOIN (SELECT {key}, MIN(id) AS keep FROM {table} WHERE {filled} GROUP BY {key}) k
+              ON {" AND ".join(f"t.{c} = k.{c}" for c in cols)}
+            WHERE t.id != k.keep"""
+        ).fetchall()
+        if table == "answers" and dups:
+            _remap_answer_ids(cur, dict(dups))
+        cur.executemany(f"DELETE FROM {table} WHERE id=?", [(d,) for d, _ in dups])
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table}({key})")
+        if replaces:
+            cur.execute(f"DROP INDEX IF EXISTS {replaces}")
+
+
+def _remap_answer_ids(cur: sqlite3.Cursor, mapping: Dict[int, int]) -> None:
+    """Переписывает id ответов в test_results.answers и test_sessions.answers по mapping."""
+    if content_split():
+        # ссылки лежат в БД пользователей
+        with _write() as conn:
+            _remap_answer_refs(conn.cursor(), mapping)
+    else:
+        _remap_answer_refs(cur, mapping)
+
+
+def _remap_answer_refs(cur: sqlite3.Cursor, mapping: Dict[int, int]) -> None:
+    for table, pk in (("test_results", "id"), ("test_sessions", "user_id")):
+        if not _has_col(cur, table, "answers"):
+            continue
+        updates = []
+        for key, blob in cur.connection.execute(
+            f"SELECT {pk}, answers FROM {table} WHERE answers IS NOT NULL"
+        ):
+            ids = unpack_ints(blob)
+            new = tuple(mapping.get(i, i) for i in ids)
+            if new != ids:
+                updates.append((pack_ints(new), key))
+        cur.executemany(f"UPDATE {table} SET answers=? WHERE {pk}=?", updates)
+
+
+RESULTS_CHUNK = 1000
+
+
+def _m_test_results(cur: sqlite3.Cursor) -> None:
+    """
+    test_results: история прохождений теста с баллами по колонкам. Старые
+    JSON-строки users.test_scores переносятся потоково, пачками; дата у них
+    неизвестна (created_at NULL). Колонка users.test_scores больше не пишется.
+    """
+    cur.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS test_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        created_at INTEGER,  -- unix time, UTC
+        {", ".join(f"score_{c} INTEGER NOT NULL DEFAULT 0" for c in CATEGORIES)},
+        top1 TEXT,
+        top2 TEXT
+    )"""
+    )
+    # последний/история пользователя: WHERE user_id=? ORDER BY created_at DESC, id DESC
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_test_results_user_created "
+        "ON test_results(user_id, created_at)"
+    )
+    # аналитика за период: WHERE created_at>=? GROUP BY top1 — покрывающий
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_test_results_created_top1 "
+        "ON test_results(created_at, top1, user_id)"
+    )
+    if not _has_col(cur, "users", "test_scores"):
+        return
+    legacy = cur.connection.execute(
+        "SELECT user_id, test_scores FROM users "
+        "WHERE test_scores IS NOT NULL AND test_scores != '' ORDER BY id"
+    )
+    rows = (
+        (uid, None) + scores + top_two(scores)
+        for uid, scores in ((uid, _parse_legacy_scores(blob)) for uid, blob in legacy)
+        if scores is not None
+    )
+    insert = (
+        f"INSERT INTO test_results (user_id, created_at, {_RESULT_COLS}, top1, top2) "
+        f"VALUES ({', '.join('?' * (len(CATEGORIES) + 4))})"
+    )
+    while True:
+        chunk = list(itertools.islice(rows, RESULTS_CHUNK))
+        if not chunk:
+            break
+        cur.executemany(insert, chunk)
+
+
+def _m_test_sessions(cur: sqlite3.Cursor) -> None:
+    """
+    test_sessions — незаконченные тесты и ожидание отзыва (переживают рестарт);
+    test_results.answers — выбранные ответы для пересчёта баллов.
+    """
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS test_sessions (
+        user_id INTEGER PRIMARY KEY,
+        mode INTEGER NOT NULL,
+        qidx INTEGER NOT NULL DEFAULT 0,
+        scores BLOB,  -- pack_ints, порядок CATEGORIES
+        answers BLOB,  -- pack_ints, id ответов по порядку
+        started_at INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL
+    )"""
+    )
+    # purge_sessions: WHERE updated_at < ?
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_test_sessions_updated ON test_sessions(updated_at)"
+    )
+    if not _has_col(cur, "test_results", "answers"):
+        cur.execute("ALTER TABLE test_results ADD COLUMN answers BLOB")
+
+
+def _m_job_cursors(cur: sqlite3.Cursor) -> None:
+    """job_cursors — докуда дошли офлайн-задачи (rescore_results.py), для продолжения."""
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS job_cursors (
+        job TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0,
+        content_version INTEGER,  -- версия контента, под которую считали
+        updated_at INTEGER
+    )"""
+    )
+
+
+# (версия, название, {часть схемы: функция}) — части "user" и "content" идут
+# в свои файлы, у каждого файла свой PRAGMA user_version (общий, если файл один).
+# Миграции идемпотентны: базы, созданные до реестра (user_version=0),
+# проходят их все. Новые миграции — только в конец списка.
+MIGRATIONS: List[Tuple[int, str, Dict[str, Callable[[sqlite3.Cursor], None]]]] = [
+    (1, "base schema", {"user": _m_user_tables, "content": _m_content_tables}),
+    (2, "courses.price_tier", {"content": _m_price_tier}),
+    (3, "hot lookup indexes", {"content": _m_indexes}),
+    (4, "tips.weight", {"content": _m_tip_weight}),
+    (5, "content version", {"content": _m_content_version}),
+    (6, "natural keys", {"content": _m_natural_keys}),
+    (7, "test results", {"user": _m_test_results}),
+    (8, "test sessions", {"user": _m_test_sessions}),
+    (9, "job cursors", {"user": _m_job_cursors}),
+    (10, "price_tier follows level", {"content": _m_price_tier_sync}),
+    (11, "price_tier() in triggers", {"content": _m_price_tier_function}),
+    (12, "answers keyed by position", {"content": _m_answer_positions}),
+    (13, "drop catalog lookup indexes", {"content": _m_drop_lookup_indexes}),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def init_db() -> List[Tuple[str, float]]:
+    """
+    Доводит схему до SCHEMA_VERSION, каждая миграция — в своей транзакции.
+    Возвращает [(название, секунды)] применённых миграций; для актуальной
+    базы это одно чтение PRAGMA user_version.
+    """
+    if content_split():
+        targets = [("users ", _write, ("user",)), ("content ", _content_write, ("content",))]
+    else:
+        targets = [("", _write, ("user", "content"))]
+    applied: List[Tuple[str, float]] = []
+    for label, writer, parts in targets:
+        with writer() as conn:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, name, steps in MIGRATIONS:
+            if version <= current:
+                continue
+            todo = [steps[p] for p in parts if p in steps]
+            t0 = time.perf_counter()
+            with writer() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for migrate in todo:
+                    migrate(conn.cursor())
+                conn.execute(f"PRAGMA user_version={version}")
+            if todo:
+                applied.append(
+                    (f"{label}migration {version} ({name})", time.perf_counter() - t0)
+                )
+    return applied
+
+
+# ---------- SEED ----------
+
+SEED_DIR = os.getenv(
+    "CAREER_BOT_SEED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed")
+)
+SEED_CHUNK = 1000
+
+
+def _upsert_sql(table: str, cols: Tuple[str, ...], key: Tuple[str, ...]) -> str:
+    updates = ", ".join(f"{c}=excluded.{c}" for c in cols if c not in key)
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+        f"ON CONFLICT({', '.join(key)}) DO UPDATE SET {updates}"
+    )
+
+
+_ANSWER_COLS = (
+    "text", "text_en", "text_az",
+    "weight_creative", "weight_tech", "weight_social", "weight_business", "weight_green",
+)
+
+# таблица -> (файл, поля записи по порядку параметров, SQL upsert по натуральному ключу)
+SEED_SPECS: Dict[str, Tuple[str, Tuple[str, ...], str]] = {
+    "professions": (
+        "professions.jsonl",
+        ("category", "name", "description", "skills", "link", "domain",
+         "name_en", "description_en", "skills_en"),
+        _upsert_sql(
+            "professions",
+            ("category", "name", "description", "skills", "link", "domain",
+             "name_en", "description_en", "skills_en"),
+            ("category", "name"),
+        ),
+    ),
+    "tips": (
+        "tips.jsonl",
+        ("text", "text_en", "text_az"),
+        _upsert_sql("tips", ("text", "text_en", "text_az"), ("text",)),
+    ),
+    "courses": (
+        "courses.jsonl",
+        ("category", "title", "title_en", "link", "level", "price_tier"),
+        _upsert_sql(
+            "courses",
+            ("category", "title", "title_en", "link", "level", "price_tier"),
+            ("category", "title"),
+        ),
+    ),
+    "questions": (
+        "questions.jsonl",
+        ("order_idx", "text", "text_en", "text_az"),
+        _upsert_sql("questions", ("order_idx", "text", "text_en", "text_az"), ("order_idx",)),
+    ),
+    # вопрос ищется по order_idx прямо в INSERT ... SELECT, без отдельного запроса;
+    # position — порядок ответа внутри вопроса в файле (_iter_seed_rows)
+    "answers": (
+        "answers.jsonl",
+        ("position",) + _ANSWER_COLS + ("order_idx",),
+        f"""
+        INSERT INTO answers (question_id, position, {", ".join(_ANSWER_COLS)})
+        SELECT q.id, ?, {", ".join("?" * len(_ANSWER_COLS))} FROM questions q WHERE q.order_idx=?
+        ON CONFLICT(question_id, position) DO UPDATE SET
+        {", ".join(f"{c}=excluded.{c}" for c in _ANSWER_COLS)}
+        """,
+    ),
+}
+# порядок загрузки: answers ссылаются на questions
+SEED_ORDER = ("professions", "tips", "courses", "questions", "answers")
+
+
+def _iter_seed_rows(path: str, fields: Tuple[str, ...]) -> Iterator[Tuple]:
+    positions: Dict[Any, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            if "price_tier" in fields:
+                # всегда из level — как триггеры
+                rec["price_tier"] = price_tier(rec.get("level"))
+            if "position" in fields:
+                q = rec.get("order_idx")
+                rec["position"] = positions.get(q, 0)
+                positions[q] = rec["position"] + 1
+            yield tuple(rec.get(k) for k in fields)
+
+
+def load_seed(
+    seed_dir: Optional[str] = None, tables: Optional[List[str]] = None
+) -> Dict[str, int]:
+    """
+    Потоково грузит JSONL-файлы каталога пачками executemany в одной
+    транзакции; upsert по натуральному ключу, так что повторный запуск
+    ничего не дублирует. Возвращает {таблица: число записей}.
+    """
+    with _content_write() as conn:
+        return _load_seed(conn, seed_dir or SEED_DIR, tables)
+
+
+def _load_seed(
+    conn: sqlite3.Connection, seed_dir: str, tables: Optional[List[str]]
+) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    conn.execute("BEGIN IMMEDIATE")
+    for table in SEED_ORDER:
+        if tables is not None and table not in tables:
+            continue
+        fname, fields, sql = SEED_SPECS[table]
+        path = os.path.join(seed_dir, fname)
+        if not os.path.exists(path):
+            continue
+        rows = _iter_seed_rows(path, fields)
+        n = 0
+        while True:
+            chunk = list(itertools.islice(rows, SEED_CHUNK))
+            if not chunk:
+                break
+            conn.executemany(sql, chunk)
+            n += len(chunk)
+        counts[table] = n
+    return counts
+
+
+def seed_data() -> Dict[str, int]:
+    """Начальные данные + переводы из SEED_DIR для пустых таблиц."""
+    with _content_write() as conn:
+        # какие таблицы пусты — одним запросом, без COUNT(*)
+        has_profs, has_tips, has_courses, has_questions = conn.execute(
+            """
+            SELECT EXISTS (SELECT 1 FROM professions), EXISTS (SELECT 1 FROM tips),
+                   EXISTS (SELECT 1 FROM courses), EXISTS (SELECT 1 FROM questions)
+        """
+        ).fetchone()
+        empty = [
+            table
+            for table, has in (
+                ("professions", has_profs),
+                ("tips", has_tips),
+                ("courses", has_courses),
+                ("questions", has_questions),
+                ("answers", has_questions),  # ответы сидятся вместе с вопросами
             )
+            if not has
+        ]
+        return _load_seed(conn, SEED_DIR, empty) if empty else {}
+
+
+def seed_snapshot(seed_dir: Optional[str] = None) -> "ContentSnapshot":
+    """Слепок контента прямо из JSONL, без файла БД (загрузчик — in-memory SQLite)."""
+    conn = sqlite3.connect(":memory:")
+    _register_functions(conn)
+    try:
+        with conn:
+            for _, _, steps in MIGRATIONS:
+                if "content" in steps:
+                    steps["content"](conn.cursor())
+        with conn:
+            _load_seed(conn, seed_dir or SEED_DIR, None)
+        version = conn.execute("SELECT value FROM meta WHERE key='content_version'").fetchone()
+        return ContentSnapshot(version[0] if version else 0, conn)
+    finally:
+        conn.close()
 
-            add_ans(
-                7,
-                "Люблю пробовать новое",
-                "I like trying new things",
-                "Yenilikləri sevirəm",
-                1,
-                1,
-                1,
-                1,
-                0,
-            )
-            add_ans(
-                7,
-                "Предпочитаю стабильность",
-                "Prefer stability",
-                "Sabitliyi üstün tuturam",
-                0,
-                0,
-                0,
-                1,
-                0,
-            )
-            add_ans(
-                7,
-                "Готов рисковать ради результата",
-                "Ready to risk for result",
-                "Nəticə üçün riskə hazıram",
-                0,
-                1,
-                0,
-                1,
-                0,
-            )
-            add_ans(
-                7,
-                "Эксперименты в экотеме",
-                "Green experiments",
-                "Yaşıl eksperimentlər",
-                0,
-                0,
-                0,
-                0,
-                2,
-            )
 
-            add_ans(
-                8,
-                "Глубина экспертизы важнее",
-                "Depth > impact",
-                "Dərinlik > təsir",
-                0,
-                1,
-                0,
-                1,
-                0,
-            )
-            add_ans(
-                8,
-                "Влияние на опыт людей важнее",
-                "Impact > depth",
-                "Təsir > dərinlik",
-                1,
-                0,
-                1,
-                0,
-                0,
-            )
-            add_ans(
-                8,
-                "Баланс: продукт и экспертиза",
-                "Balance: product & expertise",
-                "Balans: məhsul və ekspertiza",
-                1,
-                1,
-                1,
-                1,
-                0,
-            )
-            add_ans(
-                8,
-                "Проекты устойчивого развития",
-                "Sustainability projects",
-                "Dayanıqlı layihələr",
-                0,
-                0,
-                0,
-                0,
-                2,
-            )
+# ---------- USERS ----------
+# строка пользователя: (user_id, name, age_group, interest, lang)
 
-            add_ans(
-                9,
-                "Долгие excel-отчёты",
-                "Long excel reports",
-                "Uzun excel hesabatları",
-                1,
-                0,
-                1,
-                0,
-                0,
-            )
-            add_ans(
-                9,
-                "Глубокая backend-нагрузка",
-                "Heavy backend load",
-                "Ağır backend yükləri",
-                0,
-                1,
-                0,
-                0,
-                0,
-            )
-            add_ans(
-                9,
-                "Плотные продажи и скрипты",
-                "Hard sales & scripts",
-                "Sıx satışlar və skriptlər",
-                0,
-                0,
-                1,
-                0,
-                0,
-            )
-            add_ans(
-                9,
-                "Проекты без смысла для планеты",
-                "No-purpose for planet",
-                "Planet üçün mənasız layihələr",
-                0,
-                0,
-                0,
-                0,
-                2,
-            )
+USER_COLS = {"name": 1, "age_group": 2, "interest": 3, "lang": 4}
 
 
-# ---------- USERS ----------
+def _patch_user(user_id: int, **fields: Any) -> None:
+    """Write-through: правит закэшированную строку сразу после постановки записи."""
+
+    def apply(row):
+        if row is None:
+            return None
+        row = list(row)
+        for key, val in fields.items():
+            row[USER_COLS[key]] = val
+        return tuple(row)
+
+    _user_cache.update(user_id, apply)
+
+
+def _overlay_user(user_id: int, row: Optional[Tuple], pending: Dict[str, Any]):
+    """Накладывает ещё не записанные изменения на строку из БД."""
+    if "_insert" in pending:
+        name, age_group = pending["_insert"]
+        if row is None:
+            row = (user_id, name, age_group, None, None)
+        else:
+            row = row[:1] + (name,) + row[2:]
+    if row is None:
+        return None
+    row = list(row)
+    for key, val in pending.items():
+        if key != "_insert":
+            row[USER_COLS[key]] = val
+    return tuple(row)
+
 
 def add_user(user_id: int, name: str, age_group: Optional[str] = None) -> None:
-    with closing(db_connect()) as conn, conn:
-        conn.execute(
-            """
-            INSERT INTO users (user_id, name, age_group)
-            VALUES (?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET name=excluded.name
-        """,
-            (user_id, name, age_group),
-        )
+    _write_behind.submit("user", user_id, {"_insert": (name, age_group)})
+    found, row = _user_cache.get(user_id)
+    if found and row is not None:
+        _patch_user(user_id, name=name)
+    else:
+        _user_cache.invalidate(user_id)
 
 
 def set_age(user_id: int, age_group: str) -> None:
-    with closing(db_connect()) as conn, conn:
-        conn.execute(
-            "UPDATE users SET age_group=? WHERE user_id=?", (age_group, user_id)
-        )
+    _write_behind.submit("user", user_id, {"age_group": age_group})
+    _patch_user(user_id, age_group=age_group)
 
 
 def set_interest(user_id: int, interest: str) -> None:
-    with closing(db_connect()) as conn, conn:
-        conn.execute(
-            "UPDATE users SET interest=? WHERE user_id=?", (interest, user_id)
-        )
-
-
-def save_test_scores(user_id: int, scores: str) -> None:
-    with closing(db_connect()) as conn, conn:
-        conn.execute(
-            "UPDATE users SET test_scores=? WHERE user_id=?", (scores, user_id)
-        )
+    _write_behind.submit("user", user_id, {"interest": interest})
+    _patch_user(user_id, interest=interest)
 
 
 def reset_user(user_id: int) -> None:
-    with closing(db_connect()) as conn, conn:
+    """Сбрасывает выбор в профиле, избранное и результаты теста — одной транзакцией."""
+    # отложенные изменения профиля не должны лечь поверх сброса
+    _write_behind.flush()
+    with _write() as conn:
         conn.execute(
-            "UPDATE users SET age_group=NULL, interest=NULL, test_scores=NULL WHERE user_id=?",
-            (user_id,),
+            "UPDATE users SET age_group=NULL, interest=NULL WHERE user_id=?", (user_id,)
         )
         conn.execute("DELETE FROM favorites WHERE user_id=?", (user_id,))
+        conn.execute("DELETE FROM test_results WHERE user_id=?", (user_id,))
+    _fav_cache.update(user_id, lambda _: frozenset())
+    _patch_user(user_id, age_group=None, interest=None)
 
 
 def get_user(user_id: int) -> Optional[Tuple]:
-    with closing(db_connect()) as conn:
+    found, row = _user_cache.get(user_id)
+    if found:
+        return row
+    gen = _user_cache.generation(user_id)
+    with _read() as conn:
         cur = conn.cursor()
         cur.execute(
             """
-            SELECT user_id, name, age_group, interest, test_scores, lang
+            SELECT user_id, name, age_group, interest, lang
             FROM users WHERE user_id=?""",
             (user_id,),
         )
-        return cur.fetchone()
+        row = cur.fetchone()
+    pending = _write_behind.pending("user", user_id)
+    if pending:
+        row = _overlay_user(user_id, row, pending)
+    _user_cache.put(user_id, row, generation=gen)
+    return row
 
 
 def get_lang(user_id: int) -> str:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT lang FROM users WHERE user_id=?", (user_id,))
-        row = cur.fetchone()
-        return row[0] if row and row[0] else "ru"
+    row = get_user(user_id)
+    return row[4] if row and row[4] else "ru"
 
 
 def set_lang(user_id: int, lang: str) -> None:
-    with closing(db_connect()) as conn, conn:
-        conn.execute("UPDATE users SET lang=? WHERE user_id=?", (lang, user_id))
+    _write_behind.submit("user", user_id, {"lang": lang})
+    _patch_user(user_id, lang=lang)
+
+
+# ---------- TEST RESULTS ----------
+
+class TestResult(NamedTuple):
+    id: int
+    user_id: int
+    created_at: Optional[int]  # unix time; None — перенесён из users.test_scores
+    scores: Tuple[int, ...]  # в порядке CATEGORIES
+    top1: Optional[str]
+    top2: Optional[str]
+    answers: Tuple[int, ...] = ()  # id выбранных ответов; () — не сохранены
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(zip(CATEGORIES, self.scores))
+
+
+_RESULT_COLS = ", ".join(f"score_{c}" for c in CATEGORIES)
+_RESULT_INSERT = (
+    f"INSERT INTO test_results (user_id, created_at, {_RESULT_COLS}, top1, top2, answers) "
+    f"VALUES ({', '.join('?' * (len(CATEGORIES) + 5))})"
+)
+_RESULT_SELECT = (
+    f"SELECT id, user_id, created_at, {_RESULT_COLS}, top1, top2, answers FROM test_results"
+)
+
+
+def pack_ints(values: Sequence[int]) -> bytes:
+    """Компактная запись последовательности int32 (little-endian) для BLOB-колонок."""
+    return struct.pack(f"<{len(values)}i", *values)
+
+
+def unpack_ints(blob: Optional[bytes]) -> Tuple[int, ...]:
+    if not blob:
+        return ()
+    return struct.unpack(f"<{len(blob) // 4}i", blob)
+
+
+def top_two(scores: Tuple[int, ...]) -> Tuple[Optional[str], Optional[str]]:
+    """Две лучшие категории; при равенстве — в порядке CATEGORIES, как в итогах теста."""
+    ranked = sorted(range(len(CATEGORIES)), key=lambda i: scores[i], reverse=True)
+    return CATEGORIES[ranked[0]], CATEGORIES[ranked[1]]
+
+
+def _parse_legacy_scores(blob: str) -> Optional[Tuple[int, ...]]:
+    try:
+        data = json.loads(blob)
+        return tuple(int(data.get(c) or 0) for c in CATEGORIES)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def _result_row(row: Tuple) -> TestResult:
+    n = len(CATEGORIES)
+    return TestResult(
+        row[0], row[1], row[2], tuple(row[3:3 + n]), row[3 + n], row[4 + n],
+        unpack_ints(row[5 + n]),
+    )
+
+
+def save_test_result(
+    user_id: int,
+    scores: Dict[str, int],
+    created_at: Optional[int] = None,
+    answers: Sequence[int] = (),
+) -> TestResult:
+    """Добавляет прохождение теста (баллы и выбранные ответы) в историю пользователя."""
+    values = tuple(int(scores.get(c) or 0) for c in CATEGORIES)
+    top1, top2 = top_two(values)
+    created_at = int(time.time()) if created_at is None else created_at
+    answers = tuple(answers)
+    blob = pack_ints(answers) if answers else None
+    with _write() as conn:
+        cur = conn.execute(
+            _RESULT_INSERT, (user_id, created_at) + values + (top1, top2, blob)
+        )
+    return TestResult(cur.lastrowid, user_id, created_at, values, top1, top2, answers)
 
 
-# ---------- CONTENT ----------
+def latest_test_result(user_id: int) -> Optional[TestResult]:
+    rows = test_results_history(user_id, limit=1)
+    return rows[0] if rows else None
 
-def prof_by_cat(category: str) -> List[Tuple]:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute(
+
+def test_results_history(user_id: int, limit: int = 20) -> List[TestResult]:
+    """Прохождения пользователя, новые первыми."""
+    with _read() as conn:
+        rows = conn.execute(
+            f"{_RESULT_SELECT} WHERE user_id=? ORDER BY created_at DESC, id DESC LIMIT ?",
+            (user_id, limit),
+        ).fetchall()
+    return [_result_row(r) for r in rows]
+
+
+def top_category_counts(since: int, until: Optional[int] = None) -> Dict[str, int]:
+    """Сколько разных пользователей получили категорию первой за [since, until)."""
+    until = int(time.time()) + 1 if until is None else until
+    with _read() as conn:
+        rows = conn.execute(
             """
-            SELECT id, name, description, skills, link, name_en, description_en, skills_en
-            FROM professions WHERE category=? ORDER BY name
+            SELECT top1, COUNT(DISTINCT user_id) FROM test_results
+            WHERE created_at >= ? AND created_at < ?
+            GROUP BY top1
         """,
-            (category,),
+            (since, until),
+        ).fetchall()
+    return {top1: n for top1, n in rows}
+
+
+# пересчёт сохранённых результатов (rescore_results.py): keyset по id
+
+def results_page(after_id: int, limit: int) -> List[Tuple]:
+    """Следующие limit результатов с ответами: (id, answers, score_*..., top1, top2)."""
+    with _read() as conn:
+        return conn.execute(
+            f"SELECT id, answers, {_RESULT_COLS}, top1, top2 FROM test_results "
+            "WHERE id > ? AND answers IS NOT NULL ORDER BY id LIMIT ?",
+            (after_id, limit),
+        ).fetchall()
+
+
+def job_cursor(job: str) -> Optional[Tuple[int, Optional[int]]]:
+    """(last_id, content_version) задачи или None — ещё не запускалась."""
+    with _read() as conn:
+        return conn.execute(
+            "SELECT last_id, content_version FROM job_cursors WHERE job=?", (job,)
+        ).fetchone()
+
+
+def save_rescored(
+    rows: Sequence[Tuple], job: str, last_id: int, content_version: Optional[int]
+) -> None:
+    """
+    Пишет пересчитанные баллы (score_*..., top1, top2, id) и курсор задачи
+    одной транзакцией: после прерывания пачка либо записана целиком, либо нет.
+    """
+    sets = ", ".join(f"score_{c}=?" for c in CATEGORIES)
+    with _write() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(f"UPDATE test_results SET {sets}, top1=?, top2=? WHERE id=?", rows)
+        conn.execute(
+            _upsert_sql(
+                "job_cursors", ("job", "last_id", "content_version", "updated_at"), ("job",)
+            ),
+            (job, last_id, content_version, int(time.time())),
         )
-        return cur.fetchall()
 
 
-def prof_by_domain(domain: str) -> List[Tuple]:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute(
+# ---------- TEST SESSIONS ----------
+# строка сессии: (user_id, mode, qidx, scores, answers, started_at, updated_at),
+# scores и answers — pack_ints. Пишется через write-behind: ответ на кнопку
+# не ждёт commit, последняя версия сессии вытесняет предыдущие в очереди.
+
+_SESSION_COLS = ("user_id", "mode", "qidx", "scores", "answers", "started_at", "updated_at")
+_SESSION_UPSERT = _upsert_sql("test_sessions", _SESSION_COLS, ("user_id",))
+
+
+def _merge_session(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    return new
+
+
+def _flush_sessions(
+    conn: sqlite3.Connection, items: List[Tuple[int, Dict[str, Any]]]
+) -> None:
+    rows = [p["row"] for _, p in items if p["row"] is not None]
+    if rows:
+        conn.executemany(_SESSION_UPSERT, rows)
+    gone = [(uid,) for uid, p in items if p["row"] is None]
+    if gone:
+        conn.executemany("DELETE FROM test_sessions WHERE user_id=?", gone)
+
+
+_WRITE_KINDS["session"] = (_merge_session, _flush_sessions, None)
+
+
+def save_session(row: Tuple) -> None:
+    _write_behind.submit("session", row[0], {"row": row})
+
+
+def delete_session(user_id: int) -> None:
+    _write_behind.submit("session", user_id, {"row": None})
+
+
+def load_session(user_id: int) -> Optional[Tuple]:
+    pending = _write_behind.pending("session", user_id)
+    if pending is not None:
+        return pending["row"]
+    with _read() as conn:
+        return conn.execute(
+            f"SELECT {', '.join(_SESSION_COLS)} FROM test_sessions WHERE user_id=?",
+            (user_id,),
+        ).fetchone()
+
+
+def purge_sessions(before: int) -> int:
+    """Удаляет сессии, не менявшиеся с before (unix time); возвращает число строк."""
+    _write_behind.flush()
+    with _write() as conn:
+        return conn.execute(
+            "DELETE FROM test_sessions WHERE updated_at < ?", (before,)
+        ).rowcount
+
+
+# ---------- CONTENT SNAPSHOT ----------
+
+def _localized(lang: str, ru: Optional[str], en: Optional[str], az: Optional[str]):
+    if lang == "en" and en:
+        return en
+    if lang == "az" and az:
+        return az
+    return ru
+
+
+class TipSampler:
+    """Выбор совета по u из [0, 1): O(1) равномерно, O(log n) с весами."""
+
+    __slots__ = ("texts", "_cum", "_total")
+
+    def __init__(self, texts: List[str], weights: Optional[List[float]] = None):
+        self.texts = tuple(texts)
+        self._cum: Optional[List[float]] = None
+        self._total = 0.0
+        if weights and len(set(weights)) > 1:
+            cum = list(itertools.accumulate(max(0.0, w) for w in weights))
+            if cum[-1] > 0:
+                self._cum = cum
+                self._total = cum[-1]
+
+    def pick(self, u: float) -> Optional[str]:
+        n = len(self.texts)
+        if not n:
+            return None
+        if self._cum is None:
+            i = int(u * n)
+        else:
+            i = bisect.bisect_right(self._cum, u * self._total)
+        return self.texts[min(i, n - 1)]
+
+
+class FavItem(NamedTuple):
+    id: int
+    title: str  # professions.name / courses.title
+    category: str
+    link: Optional[str]
+
+
+FAV_TYPES = ("profession", "course")
+
+
+class ContentSnapshot:
+    """
+    Неизменяемый слепок каталога и теста с индексами по категории, домену,
+    вопросу и ответу. Заменяется целиком при перезагрузке.
+
+    Выборки каталога идут отсюда и SQL не выполняют, поэтому индексы горячих
+    выборок (INDEXES, миграция 3) с появлением слепка стали лишними —
+    миграция 13 их удаляет. Сама загрузка читает таблицы целиком.
+    """
+
+    def __init__(self, version: int, conn: sqlite3.Connection):
+        self.version = version
+
+        # (entity_type, id) -> FavItem: избранное хранится в БД пользователей
+        self.fav_items: Dict[Tuple[str, int], FavItem] = {}
+        profs: Dict[str, List[Tuple]] = {}
+        by_domain: Dict[str, List[Tuple]] = {}
+        for row in conn.execute(
             """
-            SELECT id, name, description, skills, link, name_en, description_en, skills_en
-            FROM professions WHERE domain=? ORDER BY name
-        """,
-            (domain,),
-        )
-        return cur.fetchall()
+            SELECT id, name, description, skills, link, name_en, description_en, skills_en,
+                   category, domain
+            FROM professions ORDER BY name, id"""
+        ):
+            profs.setdefault(row[8], []).append(row[:8])
+            by_domain.setdefault(row[9], []).append(row[:8])
+            self.fav_items[("profession", row[0])] = FavItem(row[0], row[1], row[8], row[4])
+        self.professions_by_cat = {k: tuple(v) for k, v in profs.items()}
+        self.professions_by_domain = {k: tuple(v) for k, v in by_domain.items()}
+
+        courses: Dict[str, List[Tuple]] = {}
+        free: Dict[str, List[Tuple]] = {}
+        for cid, title, link, level, title_en, category, tier in conn.execute(
+            """
+            SELECT id, title, link, level, title_en, category, price_tier
+            FROM courses ORDER BY id"""
+        ):
+            row = (cid, title, link, level, title_en)
+            self.fav_items[("course", cid)] = FavItem(cid, title, category, link)
+            courses.setdefault(category, []).append(row)
+            if tier == PRICE_FREE:
+                free.setdefault(category, []).append(row)
+        self.courses_by_cat = {k: tuple(v) for k, v in courses.items()}
+        self.free_courses_by_cat = {k: tuple(v) for k, v in free.items()}
+
+        tips = conn.execute(
+            "SELECT text, text_en, text_az, weight FROM tips ORDER BY id"
+        ).fetchall()
+        weights = [1.0 if w is None else float(w) for *_, w in tips]
+        self.tip_samplers: Dict[str, TipSampler] = {
+            lang: TipSampler(
+                [
+                    _localized(lang, ru, en, az) or en or az or DEFAULT_TIP
+                    for ru, en, az, _ in tips
+                ],
+                weights,
+            )
+            for lang in CONTENT_LANGS
+        }
+
+        self.questions_by_idx: Dict[int, Tuple] = {}
+        n_questions = 0
+        for row in conn.execute(
+            "SELECT order_idx, id, text, text_en, text_az FROM questions ORDER BY id"
+        ):
+            n_questions += 1
+            # как fetchone() по индексу order_idx — первая строка с этим индексом
+            self.questions_by_idx.setdefault(row[0], row[1:])
+        self.questions_count = n_questions
+
+        answers: Dict[int, List[Tuple]] = {}
+        # веса — кортежи в порядке CATEGORIES, NULL -> 0: готовая строка на каждый ответ
+        self.answer_weights: Dict[int, Tuple[int, int, int, int, int]] = {}
+        for row in conn.execute(
+            """
+            SELECT id, question_id, text, text_en, text_az,
+                   weight_creative, weight_tech, weight_social, weight_business, weight_green
+            FROM answers ORDER BY id"""
+        ):
+            aid, qid = row[0], row[1]
+            answers.setdefault(qid, []).append((aid,) + row[2:])
+            self.answer_weights[aid] = tuple(w or 0 for w in row[5:])
+        self.answers_by_question = {k: tuple(v) for k, v in answers.items()}
+
+    # выборки в форме, которую ждут хендлеры (общие для всех хранилищ)
+
+    def prof_by_cat(self, category: str) -> List[Tuple]:
+        return list(self.professions_by_cat.get(category, ()))
+
+    def prof_by_domain(self, domain: str) -> List[Tuple]:
+        return list(self.professions_by_domain.get(domain, ()))
+
+    def courses(self, category: str) -> List[Tuple]:
+        return list(self.courses_by_cat.get(category, ()))
+
+    def free_courses(self, category: str, limit: int) -> List[Tuple]:
+        return list(self.free_courses_by_cat.get(category, ())[:limit])
+
+    def tip_sampler(self, lang: str) -> TipSampler:
+        return self.tip_samplers.get(lang) or self.tip_samplers["ru"]
+
+    def question(self, order_idx: int, lang: str) -> Optional[Tuple[int, str]]:
+        row = self.questions_by_idx.get(order_idx)
+        if not row:
+            return None
+        qid, ru, en, az = row
+        return (qid, _localized(lang, ru, en, az))
+
+    def answers(self, question_id: int, lang: str) -> List[Tuple]:
+        return [
+            (rid, _localized(lang, ru, en, az), wc, wt, ws, wb, wg)
+            for rid, ru, en, az, wc, wt, ws, wb, wg in self.answers_by_question.get(
+                question_id, ()
+            )
+        ]
+
+    def weights(self, answer_id: int) -> Optional[Dict[str, int]]:
+        row = self.answer_weights.get(answer_id)
+        if not row:
+            return None
+        return dict(zip(CATEGORIES, row))
+
+    def answer_row(self, answer_id: int) -> Optional[Tuple[int, ...]]:
+        """Веса ответа в порядке CATEGORIES — общий кортеж, без копии."""
+        return self.answer_weights.get(answer_id)
+
+    def favorites(self, ids: FrozenSet[Tuple[str, int]]) -> Dict[str, List[FavItem]]:
+        """Карточки избранного по типам, по имени; удалённые из каталога — пропускаются."""
+        res: Dict[str, List[FavItem]] = {t: [] for t in FAV_TYPES}
+        for key in ids:
+            item = self.fav_items.get(key)
+            if item is not None:
+                res[key[0]].append(item)
+        for group in res.values():
+            group.sort(key=lambda it: (it.title or "", it.id))
+        return res
+
+
+class _ContentStore:
+    """
+    Держит текущий ContentSnapshot. Раз в CONTENT_CHECK_SEC проверяет, менялась
+    ли БД контента: PRAGMA data_version на своём соединении (дёшево, без чтения
+    страниц), а для immutable-файла — размер и mtime. Если менялась и
+    meta.content_version другая, строит новый слепок и атомарно подменяет ссылку.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ContentSnapshot] = None
+        self._watch: Optional[sqlite3.Connection] = None
+        self._path: Optional[str] = None
+        self._stamp: object = None  # data_version или (размер, mtime) файла
+        self._checked = 0.0
+
+    def _reset(self) -> None:
+        if self._watch is not None:
+            self._watch.close()
+        self._watch = None
+        self._path = None
+        self._snapshot = None
+        self._stamp = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def _content_version(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key='content_version'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _current_stamp(self) -> object:
+        if content_split() and CONTENT_IMMUTABLE:
+            st = os.stat(self._path)
+            return (st.st_size, st.st_mtime_ns)
+        if self._watch is None:
+            self._watch = content_connect() if content_split() else db_connect()
+        return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if not content_split():
+            with _read() as conn:
+                yield conn
+            return
+        # immutable-соединение не видит последующих изменений — каждый раз новое
+        conn = content_connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, force: bool = False) -> ContentSnapshot:
+        snap = self._snapshot
+        if snap is not None and not force:
+            if time.monotonic() - self._checked < CONTENT_CHECK_SEC:
+                return snap
+        get_pool()  # смена DB_PATH сбрасывает слепок — до захвата self._lock
+        with self._lock:
+            if self._path != content_db_path():
+                self._reset()
+                self._path = content_db_path()
+            self._checked = time.monotonic()
+            stamp = self._current_stamp()
+            snap = self._snapshot
+            if snap is None or force or stamp != self._stamp:
+                with self._connect() as conn:
+                    conn.execute("BEGIN")  # один согласованный срез всех таблиц
+                    try:
+                        version = self._content_version(conn)
+                        if snap is None or force or version != snap.version:
+                            snap = ContentSnapshot(version, conn)
+                            self._snapshot = snap
+                    finally:
+                        conn.rollback()
+            self._stamp = stamp
+            return snap
+
+
+_content_store = _ContentStore()
+
+
+def content() -> ContentSnapshot:
+    """Текущий слепок контента (перечитывается, если контент в БД поменялся)."""
+    return _content_store.get()
+
+
+def reload_content() -> ContentSnapshot:
+    return _content_store.get(force=True)
+
+
+# ---------- CONTENT ----------
+
+def prof_by_cat(category: str) -> List[Tuple]:
+    return content().prof_by_cat(category)
+
+
+def prof_by_domain(domain: str) -> List[Tuple]:
+    return content().prof_by_domain(domain)
 
 
 def courses_by_cat(category: str) -> List[Tuple]:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT id, title, link, level, title_en
-            FROM courses WHERE category=?
-        """,
-            (category,),
-        )
-        return cur.fetchall()
+    return content().courses(category)
 
 
 def free_courses_by_cat(
     category: str, limit: int = 3
 ) -> List[Tuple[int, str, str, str, str]]:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT id, title, link, level, title_en
-            FROM courses
-            WHERE category=? AND LOWER(level) IN ('бесплатно','free')
-            ORDER BY id LIMIT ?
-        """,
-            (category, limit),
-        )
-        return cur.fetchall()
+    return content().free_courses(category, limit)
 
 
 def random_tip(lang: str = "ru") -> str:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        try:
-            cur.execute(
-                "SELECT text, text_en, text_az FROM tips ORDER BY RANDOM() LIMIT 1"
-            )
-            row = cur.fetchone()
-        except sqlite3.OperationalError:
-            # старые базы, где ещё нет колонок text_en/text_az
-            cur.execute("SELECT text FROM tips ORDER BY RANDOM() LIMIT 1")
-            r = cur.fetchone()
-            return r[0] if r else "Делай маленькие шаги каждый день."
-        if not row:
-            return "Делай маленькие шаги каждый день."
-        ru, en, az = row
-        if lang == "en" and en:
-            return en
-        if lang == "az" and az:
-            return az
-        return ru or en or az or "Делай маленькие шаги каждый день."
+    return content().tip_sampler(lang).pick(random.random()) or DEFAULT_TIP
+
+
+def tip_point(user_id: int, day: Optional[datetime.date] = None) -> float:
+    """Точка в [0, 1) для совета дня: зависит только от пользователя и даты."""
+    day = day or datetime.date.today()
+    digest = hashlib.blake2b(f"{user_id}:{day.isoformat()}".encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "big") / 2**64
+
+
+def tip_of_the_day(
+    user_id: int, lang: str = "ru", day: Optional[datetime.date] = None
+) -> str:
+    """Совет, одинаковый для пользователя в течение дня."""
+    return content().tip_sampler(lang).pick(tip_point(user_id, day)) or DEFAULT_TIP
 
 
 # ---------- FAVORITES ----------
 
+def favorite_ids(user_id: int) -> FrozenSet[Tuple[str, int]]:
+    """Множество {(entity_type, entity_id)} избранного пользователя (из кэша)."""
+    found, ids = _fav_cache.get(user_id)
+    if found:
+        return ids
+    gen = _fav_cache.generation(user_id)
+    with _read() as conn:
+        ids = frozenset(
+            conn.execute(
+                "SELECT entity_type, entity_id FROM favorites WHERE user_id=?", (user_id,)
+            ).fetchall()
+        )
+    _fav_cache.put(user_id, ids, generation=gen)
+    return ids
+
+
+def is_favorite(user_id: int, entity_type: str, entity_id: int) -> bool:
+    return (entity_type, entity_id) in favorite_ids(user_id)
+
+
 def toggle_favorite(user_id: int, entity_type: str, entity_id: int) -> bool:
-    with closing(db_connect()) as conn, conn:
-        cur = conn.cursor()
-        try:
-            cur.execute(
-                """
-                INSERT INTO favorites (user_id, entity_type, entity_id)
-                VALUES (?, ?, ?)
-            """,
-                (user_id, entity_type, entity_id),
+    """Добавляет или убирает из избранного; True — теперь в избранном."""
+    key = (entity_type, entity_id)
+    params = (user_id, entity_type, entity_id)
+    # кэш подсказывает, какой запрос нужен; rowcount подтверждает по факту
+    present = key in favorite_ids(user_id)
+    with _write() as conn:
+        if present:
+            cur = conn.execute(
+                "DELETE FROM favorites WHERE user_id=? AND entity_type=? AND entity_id=?",
+                params,
             )
-            return True
-        except sqlite3.IntegrityError:
-            cur.execute(
-                """
-                DELETE FROM favorites WHERE user_id=? AND entity_type=? AND entity_id=?
-            """,
-                (user_id, entity_type, entity_id),
+            added = cur.rowcount == 0
+            if added:  # кэш отстал: строки уже не было
+                conn.execute(
+                    "INSERT INTO favorites (user_id, entity_type, entity_id) VALUES (?, ?, ?)",
+                    params,
+                )
+        else:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO favorites (user_id, entity_type, entity_id) "
+                "VALUES (?, ?, ?)",
+                params,
             )
-            return False
+            added = cur.rowcount == 1
+            if not added:  # кэш отстал: строка уже была
+                conn.execute(
+                    "DELETE FROM favorites WHERE user_id=? AND entity_type=? AND entity_id=?",
+                    params,
+                )
+    _fav_cache.update(user_id, lambda ids: ids | {key} if added else ids - {key})
+    return added
 
 
-def list_favorites(user_id: int) -> Dict[str, List[Tuple]]:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        res: Dict[str, List[Tuple]] = {"profession": [], "course": []}
+def list_favorites(user_id: int) -> Dict[str, List[FavItem]]:
+    """
+    Избранное {"profession": [...], "course": [...]}, по имени. id берутся из
+    кэша (не больше одного запроса к БД пользователей), карточки — из слепка.
+    """
+    return content().favorites(favorite_ids(user_id))
 
-        cur.execute(
-            """
-            SELECT p.id, p.name, p.category, p.link
-            FROM favorites f
-            JOIN professions p ON p.id=f.entity_id
-            WHERE f.user_id=? AND f.entity_type='profession'
-            ORDER BY p.name
-        """,
-            (user_id,),
-        )
-        res["profession"] = cur.fetchall()
 
-        cur.execute(
-            """
-            SELECT c.id, c.title, c.category, c.link
-            FROM favorites f
-            JOIN courses c ON c.id=f.entity_id
-            WHERE f.user_id=? AND f.entity_type='course'
-            ORDER BY c.title
-        """,
-            (user_id,),
-        )
-        res["course"] = cur.fetchall()
-        return res
-
-
-def list_fav_courses_only(user_id: int) -> List[Tuple[int, str, str, str]]:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT c.id, c.title, c.category, c.link
-            FROM favorites f
-            JOIN courses c ON c.id=f.entity_id
-            WHERE f.user_id=? AND f.entity_type='course'
-            ORDER BY c.title
-        """,
-            (user_id,),
-        )
-        return cur.fetchall()
+def list_fav_courses_only(user_id: int) -> List[FavItem]:
+    return list_favorites(user_id)["course"]
 
 
 # ---------- TEST (локализация) ----------
 
 def questions_count() -> int:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM questions")
-        row = cur.fetchone()
-        return row[0] if row and row[0] is not None else 0
+    return content().questions_count
 
 
 def get_question_by_index(order_idx: int, lang: str = "ru") -> Optional[Tuple[int, str]]:
     """Возвращает (id, локализованный текст)."""
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, text, text_en, text_az FROM questions WHERE order_idx=?",
-            (order_idx,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return None
-        qid, ru, en, az = row
-        txt = ru
-        if lang == "en" and en:
-            txt = en
-        elif lang == "az" and az:
-            txt = az
-        return (qid, txt)
+    return content().question(order_idx, lang)
 
 
 def get_answers_for_question(
     question_id: int, lang: str = "ru"
 ) -> List[Tuple[int, str, int, int, int, int, int]]:
     """Возвращает локализованные ответы с весами."""
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT id, text, text_en, text_az,
-                   weight_creative, weight_tech, weight_social, weight_business, weight_green
-            FROM answers WHERE question_id=? ORDER BY id
-        """,
-            (question_id,),
-        )
-        rows = cur.fetchall()
-        out = []
-        for rid, ru, en, az, wc, wt, ws, wb, wg in rows:
-            txt = ru
-            if lang == "en" and en:
-                txt = en
-            elif lang == "az" and az:
-                txt = az
-            out.append((rid, txt, wc, wt, ws, wb, wg))
-        return out
+    return content().answers(question_id, lang)
 
 
 def get_answer_weights(answer_id: int) -> Optional[Dict[str, int]]:
-    with closing(db_connect()) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT weight_creative, weight_tech, weight_social, weight_business, weight_green
-            FROM answers WHERE id=?
-        """,
-            (answer_id,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return None
-        return {
-            "creative": row[0],
-            "tech": row[1],
-            "social": row[2],
-            "business": row[3],
-            "green": row[4],
-        }
+    return content().weights(answer_id)
+
+
+def get_answer_row(answer_id: int) -> Optional[Tuple[int, ...]]:
+    return content().answer_row(answer_id)
@@ -179,6 +179,8 @@ _FALLBACK: Dict[str, Dict[str, str]] = {
 }
 
 _cache = {}
+# растёт при каждом reload(): по нему кэши готовых текстов понимают, что устарели
+generation = 0
 
 
 def _load_gettext(lang: str):
@@ -192,6 +194,13 @@ def _load_gettext(lang: str):
     return tr
 
 
+def reload() -> None:
+    """Забывает загруженные каталоги gettext — например, после compile_translations.py."""
+    global generation
+    _cache.clear()
+    generation += 1
+
+
 def tr(lang: str, key: str) -> str:
     """
     Надёжный транслятор: сначала gettext, если результат равен ключу -> fallback dictionary.
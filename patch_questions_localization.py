@@ -2,7 +2,8 @@
 import sqlite3
 import os
 
-DB_PATH = os.getenv("CAREER_BOT_DB", "career_bot.db")
+# вопросы — в БД контента (CAREER_BOT_CONTENT_DB), если она вынесена отдельно
+DB_PATH = os.getenv("CAREER_BOT_CONTENT_DB") or os.getenv("CAREER_BOT_DB", "career_bot.db")
 
 QUESTIONS = [
     # order_idx, ru, en, az
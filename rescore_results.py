@@ -0,0 +1,78 @@
+# rescore_results.py
+"""
+Пересчёт сохранённых результатов теста после правки весов ответов.
+
+Идёт по test_results keyset-пагинацией по id, считает баллы пачкой из
+сохранённых ответов (scoring.score_packed), пишет изменившиеся строки и
+курсор одной транзакцией на пачку. Прерванный запуск продолжается с
+курсора; если с тех пор сменилась версия контента — начинается заново.
+Результаты без ответов (перенесённые из users.test_scores, stateless-режим)
+пересчитать не из чего — они пропускаются. users.interest — выбор
+пользователя, а не итог теста, его задача не трогает.
+
+    python rescore_results.py [--chunk 5000] [--restart]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import db_dao as dao
+import scoring
+
+JOB = "rescore"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Пересчёт test_results по текущим весам")
+    ap.add_argument("--chunk", type=int, default=5000)
+    ap.add_argument("--restart", action="store_true",
+                    help="начать с начала, даже если версия контента не менялась")
+    args = ap.parse_args()
+
+    dao.init_db()
+    snap = dao.reload_content()
+    eng = scoring.engine(snap)
+    cursor = dao.job_cursor(JOB)
+    last_id = 0
+    if cursor and cursor[1] == snap.version and not args.restart:
+        last_id = cursor[0]
+        print(f"resuming after id {last_id} (content version {snap.version})")
+
+    n = len(dao.CATEGORIES)
+    cats = np.array(dao.CATEGORIES, dtype=object)
+    seen = changed = 0
+    t0 = time.perf_counter()
+    while True:
+        rows = dao.results_page(last_id, args.chunk)
+        if not rows:
+            break
+        scores = eng.score_packed([r[1] for r in rows])
+        # top1/top2 как top_two: при равенстве — раньше в CATEGORIES
+        top = np.argsort(-scores, axis=1, kind="stable")[:, :2]
+        old = np.array([r[2:2 + n] for r in rows], dtype=np.int64)
+        top1, top2 = cats[top[:, 0]], cats[top[:, 1]]
+        diff = (scores != old).any(axis=1) | np.array(
+            [(r[2 + n], r[3 + n]) != (a, b) for r, a, b in zip(rows, top1, top2)]
+        )
+        updates = [
+            tuple(scores[i].tolist()) + (top1[i], top2[i], rows[i][0])
+            for i in np.flatnonzero(diff)
+        ]
+        last_id = rows[-1][0]
+        dao.save_rescored(updates, JOB, last_id, snap.version)
+        seen += len(rows)
+        changed += len(updates)
+        dt = time.perf_counter() - t0
+        print(f"id <= {last_id}: {seen} rows, {changed} changed, {seen / dt:,.0f} rows/s")
+
+    dt = time.perf_counter() - t0
+    rate = f", {seen / dt:,.0f} rows/s" if seen else ""
+    print(f"done: {seen} rows, {changed} changed in {dt:.2f} s{rate}")
+    dao.close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# scoring.py
+"""
+Подсчёт баллов теста на матрице весов ответов (NumPy).
+
+Матрица собирается из слепка контента: строка — ответ, столбцы — категории
+в порядке CATEGORIES. Баллы сессии — сумма выбранных строк; пачку
+сохранённых последовательностей ответов считает один вызов score_batch.
+Строка 0 нулевая: неизвестный (удалённый из каталога) ответ ничего не даёт.
+
+Ранний финиш (CAREER_BOT_EARLY_FINISH = off | top1 | top2): по хвостам теста
+заранее посчитан худший для каждой пары категорий исход оставшихся вопросов;
+если лидер (и второе место для top2) уже не может смениться — тест закончен.
+"""
+import os
+import threading
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+import db_dao as dao
+
+EARLY_FINISH_MODES = ("off", "top1", "top2")
+EARLY_FINISH = os.getenv("CAREER_BOT_EARLY_FINISH", "off")
+if EARLY_FINISH not in EARLY_FINISH_MODES:
+    raise RuntimeError(
+        f"unknown CAREER_BOT_EARLY_FINISH={EARLY_FINISH!r}, expected one of {EARLY_FINISH_MODES}"
+    )
+
+
+class ScoringEngine:
+    """Скомпилированная матрица весов и индекс answer_id -> строка."""
+
+    def __init__(
+        self,
+        answer_weights: Dict[int, Sequence[int]],
+        version: int = 0,
+        questions: Sequence[Sequence[int]] = (),
+    ):
+        """questions — id ответов каждого вопроса в порядке теста (idx 0, 1, ...)."""
+        self.version = version
+        ids = np.fromiter(answer_weights.keys(), dtype=np.int64, count=len(answer_weights))
+        self.matrix = np.zeros((len(ids) + 1, len(dao.CATEGORIES)), dtype=np.int32)
+        # id ответов — автоинкремент, поэтому индекс — плотный массив, а не dict
+        self.index = np.zeros(int(ids.max()) + 1 if len(ids) else 1, dtype=np.int32)
+        if len(ids):
+            self.matrix[1:] = [[w or 0 for w in row] for row in answer_weights.values()]
+            self.index[ids] = np.arange(1, len(ids) + 1, dtype=np.int32)
+        self.questions_count = len(questions)
+        # remaining[k][a, b] — минимум (w_a - w_b) по всем путям через вопросы k..:
+        # на столько категория a может отстать от b до конца теста (в худшем случае);
+        # по парам точнее, чем максимум остатка по каждой категории отдельно
+        n = self.matrix.shape[1]
+        self.remaining = np.zeros((len(questions) + 1, n, n), dtype=np.int64)
+        # строки матрицы для ответов каждого вопроса — для симуляции путей
+        self.question_rows = [self.rows(list(q)) for q in questions]
+        for pos in range(len(questions) - 1, -1, -1):
+            w = self.matrix[self.question_rows[pos]].astype(np.int64)
+            worst = (w[:, :, None] - w[:, None, :]).min(axis=0) if len(w) else 0
+            self.remaining[pos] = self.remaining[pos + 1] + worst
+        self._tie_ahead = np.arange(n)[:, None] < np.arange(n)[None, :]
+
+    @classmethod
+    def from_snapshot(cls, snap: dao.ContentSnapshot) -> "ScoringEngine":
+        questions = []
+        # тест идёт по idx 0, 1, ... до первого пропуска — как send_question
+        while len(questions) in snap.questions_by_idx:
+            qid = snap.questions_by_idx[len(questions)][0]
+            questions.append([a[0] for a in snap.answers_by_question.get(qid, ())])
+        return cls(snap.answer_weights, snap.version, questions)
+
+    def rows(self, answer_ids) -> np.ndarray:
+        """Номера строк матрицы для массива id любой формы (неизвестные -> 0)."""
+        ids = np.asarray(answer_ids, dtype=np.int64)
+        known = (ids >= 0) & (ids < len(self.index))
+        return np.where(known, self.index[np.where(known, ids, 0)], 0)
+
+    def weights(self, answer_id: int) -> Optional[Tuple[int, ...]]:
+        row = self.rows(answer_id)
+        return tuple(self.matrix[row].tolist()) if row else None
+
+    def score(self, answer_ids: Sequence[int]) -> np.ndarray:
+        """Баллы одной сессии: сумма строк выбранных ответов, shape (len(CATEGORIES),)."""
+        return self.matrix[self.rows(answer_ids)].sum(axis=0, dtype=np.int64)
+
+    def score_dict(self, answer_ids: Sequence[int]) -> Dict[str, int]:
+        return dict(zip(dao.CATEGORIES, self.score(answer_ids).tolist()))
+
+    def score_batch(self, sequences) -> np.ndarray:
+        """
+        Баллы пачки сессий, shape (n, len(CATEGORIES)).
+
+        sequences — список последовательностей разной длины или готовый
+        2D-массив id (хвост дополнен нулями: id 0 не бывает, строка нулевая).
+        """
+        if isinstance(sequences, np.ndarray) and sequences.ndim == 2:
+            return self.matrix[self.rows(sequences)].sum(axis=1, dtype=np.int64)
+        seqs = [np.asarray(s, dtype=np.int64).ravel() for s in sequences]
+        lengths = np.fromiter((len(s) for s in seqs), dtype=np.int64, count=len(seqs))
+        flat = np.concatenate(seqs) if seqs else np.zeros(0, dtype=np.int64)
+        return self._segment_sums(flat, lengths)
+
+    def score_packed(self, blobs: Iterable[bytes]) -> np.ndarray:
+        """score_batch для ответов в виде pack_ints (колонка test_results.answers)."""
+        blobs = [b or b"" for b in blobs]
+        lengths = np.fromiter(
+            (len(b) // 4 for b in blobs), dtype=np.int64, count=len(blobs)
+        )
+        flat = np.frombuffer(b"".join(blobs), dtype="<i4")
+        return self._segment_sums(flat, lengths)
+
+    def decided(self, scores: Sequence[int], next_idx: int, mode: str = EARLY_FINISH) -> bool:
+        """
+        Итог уже не изменится, какие бы ответы ни дали на вопросы с next_idx:
+        top1 — лидер, top2 — лидер и второе место (порядок и ничьи — как top_two).
+        """
+        if mode == "off":
+            return False
+        if mode not in EARLY_FINISH_MODES:
+            raise ValueError(f"unknown early finish mode {mode!r}, expected {EARLY_FINISH_MODES}")
+        s = np.asarray(scores, dtype=np.int64)
+        pos = min(max(next_idx, 0), self.questions_count)
+        # худший итоговый отрыв a от b; при равенстве выше та, что раньше в CATEGORIES
+        gap = s[:, None] - s[None, :] + self.remaining[pos]
+        ahead = (gap > 0) | ((gap == 0) & self._tie_ahead)
+        ranked = np.argsort(-s, kind="stable")
+        others = np.ones(len(s), dtype=bool)
+        for place in ranked[: 1 if mode == "top1" else 2]:
+            others[place] = False
+            if not ahead[place, others].all():
+                return False
+        return True
+
+    def _segment_sums(self, flat: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        # суммы отрезков через префиксные суммы: без цикла по сессиям
+        csum = np.zeros((len(flat) + 1, self.matrix.shape[1]), dtype=np.int64)
+        np.cumsum(self.matrix[self.rows(flat)], axis=0, out=csum[1:])
+        ends = np.cumsum(lengths)
+        return csum[ends] - csum[ends - lengths]
+
+
+_lock = threading.Lock()
+_cached: Tuple[Optional[dao.ContentSnapshot], Optional[ScoringEngine]] = (None, None)
+
+
+def engine(snap: dao.ContentSnapshot) -> ScoringEngine:
+    """Движок для слепка контента; пересобирается, когда слепок сменился."""
+    global _cached
+    src, eng = _cached
+    if src is snap and eng is not None:
+        return eng
+    with _lock:
+        src, eng = _cached
+        if src is not snap or eng is None:
+            eng = ScoringEngine.from_snapshot(snap)
+            _cached = (snap, eng)
+        return eng
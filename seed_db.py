@@ -0,0 +1,69 @@
+# seed_db.py
+"""
+Загрузка каталога из JSONL-файлов в БД (повторный запуск ничего не дублирует).
+
+    python seed_db.py                       # SEED_DIR -> DB_PATH
+    python seed_db.py --dir ./seed professions courses
+    python seed_db.py --synthetic 10000     # замер импорта на временной БД
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import db_dao as dao
+
+
+def _write_synthetic(seed_dir: str, rows: int) -> None:
+    with open(os.path.join(seed_dir, "professions.jsonl"), "w", encoding="utf-8") as f:
+        for i in range(rows):
+            rec = {
+                "category": dao.CATEGORIES[i % len(dao.CATEGORIES)],
+                "name": f"Profession {i}",
+                "description": "desc",
+                "skills": "skills",
+                "domain": f"domain{i % 50}",
+                "name_en": f"Profession {i}",
+            }
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+def _load(seed_dir: str, tables) -> None:
+    t0 = time.perf_counter()
+    counts = dao.load_seed(seed_dir, tables or None)
+    dt = time.perf_counter() - t0
+    for table, n in counts.items():
+        print(f"{table:12} {n:8d}")
+    print(f"loaded in {dt * 1000:.1f} ms")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Загрузка каталога из JSONL")
+    ap.add_argument("tables", nargs="*", help="таблицы (по умолчанию все)")
+    ap.add_argument("--dir", default=dao.SEED_DIR)
+    ap.add_argument("--synthetic", type=int, metavar="N",
+                    help="сгенерировать N профессий и загрузить во временную БД")
+    args = ap.parse_args()
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as tmp:
+            dao.DB_PATH = os.path.join(tmp, "seed.db")
+            dao.CONTENT_DB_PATH = ""
+            dao.init_db()
+            _write_synthetic(tmp, args.synthetic)
+            _load(tmp, ["professions"])
+            print("reseed:")
+            _load(tmp, ["professions"])
+            dao.close_pool()
+        return 0
+
+    dao.init_db()
+    _load(args.dir, args.tables)
+    dao.close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# sessions.py
+"""
+Состояние незаконченного теста и ожидания отзыва.
+
+Горячие сессии лежат в памяти (LRU с лимитами по числу и объёму), каждое
+изменение уходит в хранилище (для SQLite — через write-behind), поэтому
+сессия переживает рестарт и вытеснение из памяти. Сессия, не менявшаяся
+дольше TTL, считается брошенной: не возвращается и удаляется.
+Хранилище — источник правды: сессию может начать или закрыть другой воркер,
+поэтому get сверяет копию в памяти со строкой хранилища (поиск по ключу)
+и отдаёт её, только если они совпадают.
+"""
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import db_dao as dao
+from storage import Storage
+
+SESSION_TTL_SEC = float(os.getenv("CAREER_BOT_SESSION_TTL", str(24 * 3600)))
+SESSION_CACHE_SIZE = int(os.getenv("CAREER_BOT_SESSION_CACHE_SIZE", "100000"))
+SESSION_MAX_BYTES = int(os.getenv("CAREER_BOT_SESSION_MAX_BYTES", str(32 * 1024 * 1024)))
+# как часто (сек) чистить брошенные сессии в хранилище
+SESSION_PURGE_SEC = float(os.getenv("CAREER_BOT_SESSION_PURGE_SEC", "3600"))
+
+MODE_TEST = 1
+MODE_FEEDBACK = 2  # ждём текст отзыва
+
+# раскладка TestSession.data: [qidx, started, updated, баллы по CATEGORIES..., id ответов...]
+_QIDX, _STARTED, _UPDATED, _SCORES = 0, 1, 2, 3
+_ANSWERS = _SCORES + len(dao.CATEGORIES)
+# время — смещение от 2024-01-01 UTC: в int32 помещается до 2092 года
+_EPOCH = 1_704_067_200
+
+
+class TestSession:
+    """
+    Сессия одного пользователя. Всё числовое состояние — один массив int32:
+    ни словаря баллов, ни отдельных int-объектов на счётчики и время.
+    scores / answers отдают копии; меняет их только add_answer.
+    """
+
+    # mem_size — учтённый SessionStore объём, чтобы не держать пару (сессия, размер)
+    __slots__ = ("user_id", "mode", "data", "mem_size")
+
+    def __init__(
+        self,
+        user_id: int,
+        mode: int,
+        qidx: int = 0,
+        scores: Sequence[int] = (),
+        answers: Sequence[int] = (),
+        started_at: int = 0,
+        updated_at: int = 0,
+    ):
+        self.user_id = user_id
+        self.mode = mode
+        self.data = array("i", (qidx, started_at - _EPOCH, updated_at - _EPOCH))
+        self.data.extend(scores or [0] * len(dao.CATEGORIES))
+        self.data.extend(answers)
+        self.mem_size = 0
+
+    @property
+    def qidx(self) -> int:
+        return self.data[_QIDX]
+
+    @property
+    def started_at(self) -> int:
+        return self.data[_STARTED] + _EPOCH
+
+    @property
+    def updated_at(self) -> int:
+        return self.data[_UPDATED] + _EPOCH
+
+    @updated_at.setter
+    def updated_at(self, value: int) -> None:
+        self.data[_UPDATED] = value - _EPOCH
+
+    @property
+    def scores(self) -> array:
+        return self.data[_SCORES:_ANSWERS]
+
+    @property
+    def answers(self) -> array:
+        return self.data[_ANSWERS:]
+
+    def add_answer(self, answer_id: int, weights: Sequence[int]) -> None:
+        """Веса ответа в порядке CATEGORIES; следующий вопрос."""
+        data = self.data
+        for i, w in enumerate(weights, _SCORES):
+            data[i] += w
+        data.append(answer_id)
+        data[_QIDX] += 1
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> "TestSession":
+        user_id, mode, qidx, scores, answers, started_at, updated_at = row
+        return cls(
+            user_id, mode, qidx, dao.unpack_ints(scores), dao.unpack_ints(answers),
+            started_at, updated_at,
+        )
+
+    def to_row(self) -> Tuple:
+        return (
+            self.user_id, self.mode, self.qidx,
+            dao.pack_ints(self.scores), dao.pack_ints(self.answers),
+            self.started_at, self.updated_at,
+        )
+
+    def score_dict(self) -> Dict[str, int]:
+        return dict(zip(dao.CATEGORIES, self.scores))
+
+    def sizeof(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.data)
+
+
+class SessionStore:
+    """In-memory слой сессий поверх Storage (load/save/delete/purge_sessions)."""
+
+    _ENTRY_OVERHEAD = 100  # узел OrderedDict, ключ, mem_size
+
+    def __init__(
+        self,
+        backing: Storage,
+        ttl: float = SESSION_TTL_SEC,
+        max_sessions: int = SESSION_CACHE_SIZE,
+        max_bytes: int = SESSION_MAX_BYTES,
+    ):
+        self.backing = backing
+        self.ttl = ttl
+        self.max_sessions = max(1, max_sessions)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[int, TestSession]" = OrderedDict()
+        self._purged_at = 0.0
+        self.bytes = 0
+        self.started = 0
+        self.completed = 0
+        self.expired = 0
+        self.evicted = 0
+        self.loaded = 0
+
+    # --- память ---
+
+    def _expired(self, s: TestSession, now: float) -> bool:
+        return self.ttl > 0 and now - s.updated_at > self.ttl
+
+    def _remember(self, s: TestSession) -> None:
+        old = self._mem.pop(s.user_id, None)
+        if old is not None:
+            self.bytes -= old.mem_size
+        s.mem_size = s.sizeof() + self._ENTRY_OVERHEAD
+        self._mem[s.user_id] = s
+        self.bytes += s.mem_size
+        # вытесненная сессия остаётся в хранилище и подгрузится при следующем get
+        while self._mem and (
+            len(self._mem) > self.max_sessions or self.bytes > self.max_bytes
+        ):
+            _, dropped = self._mem.popitem(last=False)
+            self.bytes -= dropped.mem_size
+            self.evicted += 1
+
+    def _forget(self, user_id: int) -> None:
+        old = self._mem.pop(user_id, None)
+        if old is not None:
+            self.bytes -= old.mem_size
+
+    def _save(self, s: TestSession) -> None:
+        s.updated_at = int(time.time())
+        with self._lock:
+            self._remember(s)
+        self.backing.save_session(s.to_row())
+
+    # --- API ---
+
+    def get(self, user_id: int) -> Optional[TestSession]:
+        now = time.time()
+        row = self.backing.load_session(user_id)
+        if row is None:
+            # закрыта здесь или другим воркером
+            with self._lock:
+                self._forget(user_id)
+            return None
+        with self._lock:
+            cached = self._mem.get(user_id)
+            if cached is not None and cached.to_row() == row:
+                if not self._expired(cached, now):
+                    self._mem.move_to_end(user_id)
+                    return cached
+        s = TestSession.from_row(row)
+        if self._expired(s, now):
+            self.expired += 1
+            with self._lock:
+                self._forget(user_id)
+            self.backing.delete_session(user_id)
+            return None
+        with self._lock:
+            self._remember(s)
+        self.loaded += 1
+        return s
+
+    def start(self, user_id: int, mode: int = MODE_TEST) -> TestSession:
+        """Новая сессия; предыдущая (тест или ожидание отзыва) заменяется."""
+        now = time.time()
+        if now - self._purged_at > SESSION_PURGE_SEC:
+            self.purge_expired()
+        s = TestSession(user_id, mode, started_at=int(now))
+        self._save(s)
+        if mode == MODE_TEST:
+            self.started += 1
+        return s
+
+    def record_answer(
+        self, user_id: int, answer_id: int, weights: Sequence[int]
+    ) -> Optional[TestSession]:
+        """Прибавляет веса ответа (в порядке CATEGORIES) и переходит к следующему вопросу."""
+        s = self.get(user_id)
+        if s is None or s.mode != MODE_TEST:
+            return None
+        with self._lock:
+            s.add_answer(answer_id, weights)
+        self._save(s)
+        return s
+
+    def finish(self, user_id: int, mode: int = MODE_TEST) -> Optional[TestSession]:
+        """Закрывает сессию режима mode и возвращает её (None — такой нет)."""
+        s = self.get(user_id)
+        if s is None or s.mode != mode:
+            return None
+        with self._lock:
+            self._forget(user_id)
+        self.backing.delete_session(user_id)
+        if mode == MODE_TEST:
+            self.completed += 1
+        return s
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        self._purged_at = now
+        with self._lock:
+            # давно не тронутые — в начале LRU; в счётчик их внесёт purge хранилища
+            while self._mem:
+                s = next(iter(self._mem.values()))
+                if not self._expired(s, now):
+                    break
+                self._forget(s.user_id)
+        if self.ttl <= 0:
+            return 0
+        purged = self.backing.purge_sessions(int(now - self.ttl))
+        self.expired += purged
+        return purged
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "live": len(self._mem),
+                "bytes": self.bytes,
+                "started": self.started,
+                "completed": self.completed,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "loaded": self.loaded,
+            }
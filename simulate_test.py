@@ -0,0 +1,137 @@
+# simulate_test.py
+"""
+Баланс теста: распределение итогов по всем путям ответов.
+
+Каждый путь — один ответ на каждый вопрос, все ответы равновероятны.
+Итог считается как в format_scores: лидер — максимум баллов (при равенстве —
+раньше в CATEGORIES), «также» показывается второй категории, если она
+отстаёт от лидера не больше чем на ALSO_GAP. Пути перебираются целиком
+сложением с broadcasting по вопросам; если их больше --max-paths —
+берётся случайная выборка --samples путей.
+
+    python simulate_test.py                  # контент из существующей CAREER_BOT_DB
+    python simulate_test.py --seed-dir ./seed
+    python simulate_test.py --samples 2000000 --max-paths 0
+
+Запускать после каждой правки таблицы answers.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from typing import Tuple
+
+import numpy as np
+
+import db_dao as dao
+import scoring
+
+ALSO_GAP = 1  # как в format_scores
+
+
+def enumerate_paths(eng: scoring.ScoringEngine) -> np.ndarray:
+    """Баллы всех путей, shape (число путей, len(CATEGORIES))."""
+    totals = np.zeros((1, eng.matrix.shape[1]), dtype=np.int32)
+    for rows in eng.question_rows:
+        w = eng.matrix[rows]
+        # каждый накопленный путь x каждый ответ вопроса
+        totals = (totals[:, None, :] + w[None, :, :]).reshape(-1, totals.shape[1])
+    return totals
+
+
+def sample_paths(eng: scoring.ScoringEngine, n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    totals = np.zeros((n, eng.matrix.shape[1]), dtype=np.int32)
+    for rows in eng.question_rows:
+        totals += eng.matrix[rows[rng.integers(0, len(rows), size=n)]]
+    return totals
+
+
+def outcomes(totals: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(top1, top2, отрыв top1 от top2) для каждого пути."""
+    order = np.argsort(-totals, axis=1, kind="stable")[:, :2]
+    top = np.take_along_axis(totals, order, axis=1)
+    return order[:, 0], order[:, 1], top[:, 0] - top[:, 1]
+
+
+def _naive(totals: np.ndarray, idx: np.ndarray) -> list:
+    # та же логика, что в format_scores, на словарях — для сверки
+    out = []
+    for i in idx:
+        scores = dict(zip(dao.CATEGORIES, totals[i].tolist()))
+        ordered = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        out.append((ordered[0][0], ordered[1][0], ordered[0][1] - ordered[1][1]))
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Распределение итогов теста по путям ответов")
+    ap.add_argument("--seed-dir", help="взять контент из JSONL, а не из БД")
+    ap.add_argument("--max-paths", type=int, default=5_000_000,
+                    help="перебирать целиком, если путей не больше (0 — всегда выборка)")
+    ap.add_argument("--samples", type=int, default=1_000_000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--verify", type=int, default=2000,
+                    help="сверить столько путей с логикой format_scores")
+    args = ap.parse_args()
+
+    if args.seed_dir:
+        snap = dao.seed_snapshot(args.seed_dir)
+    else:
+        # только чтение: схему не создаём и не мигрируем
+        path = dao.content_db_path()
+        if not os.path.exists(path):
+            print(f"no database at {path}; use --seed-dir", file=sys.stderr)
+            return 1
+        snap = dao.reload_content()
+    eng = scoring.ScoringEngine.from_snapshot(snap)
+    sizes = [len(r) for r in eng.question_rows]
+    if not sizes or 0 in sizes:
+        print("no complete test in content", file=sys.stderr)
+        return 1
+    paths = math.prod(sizes)
+
+    t0 = time.perf_counter()
+    if paths <= args.max_paths:
+        totals, how = enumerate_paths(eng), "enumerated"
+    else:
+        totals, how = sample_paths(eng, args.samples, args.seed), "sampled"
+    top1, top2, gap = outcomes(totals)
+    dt = time.perf_counter() - t0
+    n = len(totals)
+    print(f"questions: {len(sizes)} ({'x'.join(map(str, sizes))}), paths: {paths:,}")
+    print(f"{how} {n:,} paths in {dt:.2f} s (content version {snap.version})\n")
+
+    also = gap <= ALSO_GAP
+    tie = gap == 0
+    print(f"{'top1':10} {'paths':>8} {'tie':>7} {'+also':>7}")
+    for i, cat in enumerate(dao.CATEGORIES):
+        mine = top1 == i
+        # tie / +also — доля среди путей, где эта категория первая
+        shares = [
+            f"{m[mine].mean():7.1%}" if mine.any() else f"{'-':>7}" for m in (tie, also)
+        ]
+        print(f"{cat:10} {mine.mean():8.1%} " + " ".join(shares))
+    print(f"\n'also' shown: {also.mean():.1%} of paths, exact tie for first: {tie.mean():.1%}")
+
+    print("\ntop1 -> also (share of all paths):")
+    pairs = np.bincount(top1[also] * len(dao.CATEGORIES) + top2[also],
+                        minlength=len(dao.CATEGORIES) ** 2)
+    for code in np.argsort(-pairs, kind="stable"):
+        if not pairs[code]:
+            break
+        a, b = divmod(int(code), len(dao.CATEGORIES))
+        print(f"  {dao.CATEGORIES[a]:10} -> {dao.CATEGORIES[b]:10} {pairs[code] / n:6.1%}")
+
+    if args.verify:
+        idx = np.random.default_rng(args.seed).integers(0, n, size=min(args.verify, n))
+        fast = [(dao.CATEGORIES[top1[i]], dao.CATEGORIES[top2[i]], int(gap[i])) for i in idx]
+        if fast != _naive(totals, idx):
+            print("mismatch with format_scores logic", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+# storage.py
+"""
+Хранилища бота за одним интерфейсом: пользователи, избранное, контент и тест.
+
+SqliteStorage — рабочее хранилище поверх db_dao (пул, кэши, write-behind).
+MemoryStorage — словари в памяти процесса, контент — слепок из JSONL сида;
+для нагрузочных тестов и прогонов без файла БД. Выбор — CAREER_BOT_STORAGE.
+"""
+import datetime
+import itertools
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+import db_dao as dao
+import scoring
+
+STORAGE = os.getenv("CAREER_BOT_STORAGE", "sqlite")
+
+
+class Storage(ABC):
+    """
+    Операции, которые нужны хендлерам. Пользовательские данные — абстрактные
+    методы; контент и тест читаются из ContentSnapshot, который отдаёт content().
+    """
+
+    # ---------- схема и жизненный цикл ----------
+
+    def init_db(self) -> List[Tuple[str, float]]:
+        return []
+
+    def check_storage_profile(self) -> Dict[str, object]:
+        return {}
+
+    def seed_data(self) -> Dict[str, int]:
+        return {}
+
+    def flush_writes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+    # ---------- users ----------
+    # строка пользователя: (user_id, name, age_group, interest, lang)
+
+    @abstractmethod
+    def add_user(self, user_id: int, name: str, age_group: Optional[str] = None) -> None: ...
+
+    @abstractmethod
+    def set_age(self, user_id: int, age_group: str) -> None: ...
+
+    @abstractmethod
+    def set_interest(self, user_id: int, interest: str) -> None: ...
+
+    @abstractmethod
+    def set_lang(self, user_id: int, lang: str) -> None: ...
+
+    @abstractmethod
+    def reset_user(self, user_id: int) -> None: ...
+
+    @abstractmethod
+    def get_user(self, user_id: int) -> Optional[Tuple]: ...
+
+    def get_lang(self, user_id: int) -> str:
+        row = self.get_user(user_id)
+        return row[4] if row and row[4] else "ru"
+
+    # ---------- test results ----------
+
+    @abstractmethod
+    def save_test_result(
+        self,
+        user_id: int,
+        scores: Dict[str, int],
+        created_at: Optional[int] = None,
+        answers: Sequence[int] = (),
+    ) -> dao.TestResult: ...
+
+    @abstractmethod
+    def test_results_history(self, user_id: int, limit: int = 20) -> List[dao.TestResult]: ...
+
+    def latest_test_result(self, user_id: int) -> Optional[dao.TestResult]:
+        rows = self.test_results_history(user_id, limit=1)
+        return rows[0] if rows else None
+
+    # ---------- test sessions ----------
+    # строка сессии: (user_id, mode, qidx, scores, answers, started_at, updated_at)
+
+    @abstractmethod
+    def load_session(self, user_id: int) -> Optional[Tuple]: ...
+
+    @abstractmethod
+    def save_session(self, row: Tuple) -> None: ...
+
+    @abstractmethod
+    def delete_session(self, user_id: int) -> None: ...
+
+    @abstractmethod
+    def purge_sessions(self, before: int) -> int: ...
+
+    # ---------- favorites ----------
+
+    @abstractmethod
+    def favorite_ids(self, user_id: int) -> FrozenSet[Tuple[str, int]]: ...
+
+    @abstractmethod
+    def toggle_favorite(self, user_id: int, entity_type: str, entity_id: int) -> bool: ...
+
+    def is_favorite(self, user_id: int, entity_type: str, entity_id: int) -> bool:
+        return (entity_type, entity_id) in self.favorite_ids(user_id)
+
+    def list_favorites(self, user_id: int) -> Dict[str, List[dao.FavItem]]:
+        return self.content().favorites(self.favorite_ids(user_id))
+
+    def list_fav_courses_only(self, user_id: int) -> List[dao.FavItem]:
+        return self.list_favorites(user_id)["course"]
+
+    # ---------- content ----------
+
+    @abstractmethod
+    def content(self) -> dao.ContentSnapshot: ...
+
+    def reload_content(self) -> dao.ContentSnapshot:
+        return self.content()
+
+    def prof_by_cat(self, category: str) -> List[Tuple]:
+        return self.content().prof_by_cat(category)
+
+    def prof_by_domain(self, domain: str) -> List[Tuple]:
+        return self.content().prof_by_domain(domain)
+
+    def courses_by_cat(self, category: str) -> List[Tuple]:
+        return self.content().courses(category)
+
+    def free_courses_by_cat(self, category: str, limit: int = 3) -> List[Tuple]:
+        return self.content().free_courses(category, limit)
+
+    def random_tip(self, lang: str = "ru") -> str:
+        return self.content().tip_sampler(lang).pick(random.random()) or dao.DEFAULT_TIP
+
+    def tip_of_the_day(
+        self, user_id: int, lang: str = "ru", day: Optional[datetime.date] = None
+    ) -> str:
+        u = dao.tip_point(user_id, day)
+        return self.content().tip_sampler(lang).pick(u) or dao.DEFAULT_TIP
+
+    # ---------- test ----------
+
+    def questions_count(self) -> int:
+        return self.content().questions_count
+
+    def get_question_by_index(
+        self, order_idx: int, lang: str = "ru"
+    ) -> Optional[Tuple[int, str]]:
+        return self.content().question(order_idx, lang)
+
+    def get_answers_for_question(self, question_id: int, lang: str = "ru") -> List[Tuple]:
+        return self.content().answers(question_id, lang)
+
+    def get_answer_weights(self, answer_id: int) -> Optional[Dict[str, int]]:
+        return self.content().weights(answer_id)
+
+    def get_answer_row(self, answer_id: int) -> Optional[Tuple[int, ...]]:
+        return self.content().answer_row(answer_id)
+
+    def score_answers(self, answer_ids: Sequence[int]) -> Dict[str, int]:
+        return scoring.engine(self.content()).score_dict(answer_ids)
+
+    def test_decided(self, scores: Sequence[int], next_idx: int) -> bool:
+        return scoring.engine(self.content()).decided(scores, next_idx)
+
+
+class SqliteStorage(Storage):
+    """db_dao как хранилище; состояние модуля общее, экземпляр — тонкая обёртка."""
+
+    def init_db(self) -> List[Tuple[str, float]]:
+        return dao.init_db()
+
+    def check_storage_profile(self) -> Dict[str, object]:
+        return dao.check_storage_profile()
+
+    def seed_data(self) -> Dict[str, int]:
+        return dao.seed_data()
+
+    def flush_writes(self) -> int:
+        return dao.flush_writes()
+
+    def close(self) -> None:
+        dao.close_pool()
+
+    def add_user(self, user_id: int, name: str, age_group: Optional[str] = None) -> None:
+        dao.add_user(user_id, name, age_group)
+
+    def set_age(self, user_id: int, age_group: str) -> None:
+        dao.set_age(user_id, age_group)
+
+    def set_interest(self, user_id: int, interest: str) -> None:
+        dao.set_interest(user_id, interest)
+
+    def set_lang(self, user_id: int, lang: str) -> None:
+        dao.set_lang(user_id, lang)
+
+    def reset_user(self, user_id: int) -> None:
+        dao.reset_user(user_id)
+
+    def get_user(self, user_id: int) -> Optional[Tuple]:
+        return dao.get_user(user_id)
+
+    def save_test_result(
+        self,
+        user_id: int,
+        scores: Dict[str, int],
+        created_at: Optional[int] = None,
+        answers: Sequence[int] = (),
+    ) -> dao.TestResult:
+        return dao.save_test_result(user_id, scores, created_at, answers)
+
+    def load_session(self, user_id: int) -> Optional[Tuple]:
+        return dao.load_session(user_id)
+
+    def save_session(self, row: Tuple) -> None:
+        dao.save_session(row)
+
+    def delete_session(self, user_id: int) -> None:
+        dao.delete_session(user_id)
+
+    def purge_sessions(self, before: int) -> int:
+        return dao.purge_sessions(before)
+
+    def test_results_history(self, user_id: int, limit: int = 20) -> List[dao.TestResult]:
+        return dao.test_results_history(user_id, limit)
+
+    def favorite_ids(self, user_id: int) -> FrozenSet[Tuple[str, int]]:
+        return dao.favorite_ids(user_id)
+
+    def toggle_favorite(self, user_id: int, entity_type: str, entity_id: int) -> bool:
+        return dao.toggle_favorite(user_id, entity_type, entity_id)
+
+    def content(self) -> dao.ContentSnapshot:
+        return dao.content()
+
+    def reload_content(self) -> dao.ContentSnapshot:
+        return dao.reload_content()
+
+
+class MemoryStorage(Storage):
+    """Пользователи и избранное в словарях, контент — слепок из seed_dir."""
+
+    def __init__(self, seed_dir: Optional[str] = None):
+        self.seed_dir = seed_dir
+        self._lock = threading.Lock()
+        self._users: Dict[int, List] = {}
+        self._favorites: Dict[int, Set[Tuple[str, int]]] = {}
+        self._results: Dict[int, List[dao.TestResult]] = {}  # по порядку добавления
+        self._result_ids = itertools.count(1)
+        self._sessions: Dict[int, Tuple] = {}
+        self._content: Optional[dao.ContentSnapshot] = None
+
+    def seed_data(self) -> Dict[str, int]:
+        snap = self.reload_content()
+        return {
+            "professions": sum(len(v) for v in snap.professions_by_cat.values()),
+            "courses": sum(len(v) for v in snap.courses_by_cat.values()),
+            "questions": snap.questions_count,
+        }
+
+    def add_user(self, user_id: int, name: str, age_group: Optional[str] = None) -> None:
+        with self._lock:
+            row = self._users.get(user_id)
+            if row is None:
+                self._users[user_id] = [user_id, name, age_group, None, None]
+            else:
+                row[1] = name
+
+    def _set(self, user_id: int, **fields) -> None:
+        with self._lock:
+            row = self._users.get(user_id)
+            if row is not None:  # как UPDATE: незнакомого пользователя не создаём
+                for key, val in fields.items():
+                    row[dao.USER_COLS[key]] = val
+
+    def set_age(self, user_id: int, age_group: str) -> None:
+        self._set(user_id, age_group=age_group)
+
+    def set_interest(self, user_id: int, interest: str) -> None:
+        self._set(user_id, interest=interest)
+
+    def set_lang(self, user_id: int, lang: str) -> None:
+        self._set(user_id, lang=lang)
+
+    def reset_user(self, user_id: int) -> None:
+        self._set(user_id, age_group=None, interest=None)
+        with self._lock:
+            self._favorites.pop(user_id, None)
+            self._results.pop(user_id, None)
+
+    def get_user(self, user_id: int) -> Optional[Tuple]:
+        row = self._users.get(user_id)
+        return tuple(row) if row is not None else None
+
+    def save_test_result(
+        self,
+        user_id: int,
+        scores: Dict[str, int],
+        created_at: Optional[int] = None,
+        answers: Sequence[int] = (),
+    ) -> dao.TestResult:
+        values = tuple(int(scores.get(c) or 0) for c in dao.CATEGORIES)
+        created_at = int(time.time()) if created_at is None else created_at
+        top1, top2 = dao.top_two(values)
+        with self._lock:
+            res = dao.TestResult(
+                next(self._result_ids), user_id, created_at, values, top1, top2,
+                tuple(answers),
+            )
+            self._results.setdefault(user_id, []).append(res)
+        return res
+
+    def test_results_history(self, user_id: int, limit: int = 20) -> List[dao.TestResult]:
+        with self._lock:
+            rows = list(self._results.get(user_id, ()))
+        # как ORDER BY created_at DESC, id DESC: перенесённые (без даты) — в конце
+        rows.sort(
+            key=lambda r: (r.created_at is not None, r.created_at or 0, r.id), reverse=True
+        )
+        return rows[:limit]
+
+    def load_session(self, user_id: int) -> Optional[Tuple]:
+        return self._sessions.get(user_id)
+
+    def save_session(self, row: Tuple) -> None:
+        self._sessions[row[0]] = row
+
+    def delete_session(self, user_id: int) -> None:
+        self._sessions.pop(user_id, None)
+
+    def purge_sessions(self, before: int) -> int:
+        with self._lock:
+            stale = [uid for uid, row in self._sessions.items() if row[6] < before]
+            for uid in stale:
+                del self._sessions[uid]
+        return len(stale)
+
+    def favorite_ids(self, user_id: int) -> FrozenSet[Tuple[str, int]]:
+        with self._lock:
+            return frozenset(self._favorites.get(user_id, ()))
+
+    def toggle_favorite(self, user_id: int, entity_type: str, entity_id: int) -> bool:
+        key = (entity_type, entity_id)
+        with self._lock:
+            favs = self._favorites.setdefault(user_id, set())
+            if key in favs:
+                favs.discard(key)
+                return False
+            favs.add(key)
+            return True
+
+    def content(self) -> dao.ContentSnapshot:
+        snap = self._content
+        return snap if snap is not None else self.reload_content()
+
+    def reload_content(self) -> dao.ContentSnapshot:
+        self._content = dao.seed_snapshot(self.seed_dir)
+        return self._content
+
+
+STORAGES = {"sqlite": SqliteStorage, "memory": MemoryStorage}
+
+
+def open_storage(kind: Optional[str] = None) -> Storage:
+    kind = kind or STORAGE
+    try:
+        return STORAGES[kind]()
+    except KeyError:
+        raise RuntimeError(
+            f"unknown CAREER_BOT_STORAGE={kind!r}, expected one of {sorted(STORAGES)}"
+        ) from None
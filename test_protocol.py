@@ -0,0 +1,68 @@
+# test_protocol.py
+"""
+Stateless-режим теста: прогресс едет в callback_data кнопок ответа.
+
+Кнопка ответа несёт индекс вопроса, на который отвечают, и баллы с учётом
+этого ответа; следующий вопрос строится только из них, без сессии на
+сервере — продолжить тест может любой воркер, рестарт его не сбрасывает.
+Подделку закрывает усечённый HMAC-SHA256 (ключ — CAREER_BOT_CALLBACK_SECRET,
+иначе BOT_TOKEN из окружения; без них stateless-режим не стартует), в подпись
+входит user_id — чужую кнопку переслать нельзя.
+
+    "t:" + base64url(версия:B, qidx:H, баллы:5h, mac:8 байт) — 30 байт
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+from typing import Optional, Sequence, Tuple
+
+import db_dao as dao
+
+PREFIX = "t:"
+CALLBACK_LIMIT = 64  # байт, ограничение Telegram на callback_data
+
+_VERSION = 1
+_PAYLOAD = struct.Struct("<BH" + "h" * len(dao.CATEGORIES))
+_MAC_LEN = 8
+_USER = struct.Struct("<q")
+
+
+class ProgressCodec:
+    """Кодирует и проверяет прогресс теста в callback_data."""
+
+    def __init__(self, secret: str):
+        self._key = hashlib.sha256(b"career-bot/test-progress:" + secret.encode()).digest()
+
+    def _mac(self, user_id: int, payload: bytes) -> bytes:
+        return hmac.new(
+            self._key, _USER.pack(user_id) + payload, hashlib.sha256
+        ).digest()[:_MAC_LEN]
+
+    def encode(self, user_id: int, qidx: int, scores: Sequence[int]) -> str:
+        payload = _PAYLOAD.pack(_VERSION, qidx, *scores)
+        token = base64.urlsafe_b64encode(payload + self._mac(user_id, payload))
+        data = PREFIX + token.rstrip(b"=").decode()
+        if len(data.encode()) > CALLBACK_LIMIT:
+            raise ValueError(f"callback_data is {len(data)} bytes, limit {CALLBACK_LIMIT}")
+        return data
+
+    def decode(self, user_id: int, data: str) -> Optional[Tuple[int, Tuple[int, ...]]]:
+        """(qidx, баллы) или None — чужая, испорченная или устаревшая кнопка."""
+        if not data.startswith(PREFIX):
+            return None
+        token = data[len(PREFIX):]
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (binascii.Error, ValueError):
+            return None
+        if len(raw) != _PAYLOAD.size + _MAC_LEN:
+            return None
+        payload, mac = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+        if not hmac.compare_digest(mac, self._mac(user_id, payload)):
+            return None
+        version, qidx, *scores = _PAYLOAD.unpack(payload)
+        if version != _VERSION:
+            return None
+        return qidx, tuple(scores)
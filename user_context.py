@@ -0,0 +1,79 @@
+# user_context.py
+"""Профиль пользователя, загружаемый один раз на апдейт."""
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+import db_async as adao
+from db_dao import TestResult
+
+
+@dataclass
+class UserContext:
+    """Строка users текущего апдейта; методы пишут в БД и обновляют поля на месте."""
+
+    user_id: int
+    name: Optional[str] = None
+    age_group: Optional[str] = None
+    interest: Optional[str] = None
+    lang_code: Optional[str] = None  # None — язык ещё не выбран
+    exists: bool = False
+
+    @classmethod
+    def from_row(cls, user_id: int, row: Optional[Tuple]) -> "UserContext":
+        # row: (user_id, name, age_group, interest, lang)
+        if not row:
+            return cls(user_id=user_id)
+        return cls(
+            user_id=user_id,
+            name=row[1],
+            age_group=row[2],
+            interest=row[3],
+            lang_code=row[4],
+            exists=True,
+        )
+
+    @property
+    def lang(self) -> str:
+        return self.lang_code or "ru"
+
+    async def ensure(self, name: str) -> None:
+        await adao.add_user(self.user_id, name)
+        self.name = name
+        self.exists = True
+
+    async def set_lang(self, lang: str) -> None:
+        await adao.set_lang(self.user_id, lang)
+        self.lang_code = lang
+
+    async def set_interest(self, interest: str) -> None:
+        await adao.set_interest(self.user_id, interest)
+        self.interest = interest
+
+    async def save_test_result(
+        self, scores: Dict[str, int], answers: Sequence[int] = ()
+    ) -> TestResult:
+        return await adao.save_test_result(self.user_id, scores, answers=answers)
+
+    async def reset(self) -> None:
+        await adao.reset_user(self.user_id)
+        self.age_group = None
+        self.interest = None
+
+
+class UserLoaderMiddleware(BaseMiddleware):
+    """Кладёт в data["user"] UserContext отправителя (одно чтение users)."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        from_user: Optional[User] = data.get("event_from_user")
+        if from_user is not None and "user" not in data:
+            row = await adao.get_user(from_user.id)
+            data["user"] = UserContext.from_row(from_user.id, row)
+        return await handler(event, data)